@@ -0,0 +1,101 @@
+"""
+Разреженные наборы полей (?fields=id,text,author) для ответов API.
+
+Каждое поле ответа знает, какие колонки ему нужны и через какую связь
+их брать, поэтому запрос читает только запрошенное, а автор и группа
+приходят тем же JOIN, без запроса на объект.
+"""
+
+
+class Field:
+    def __init__(self, columns, value, related=None):
+        self.columns = columns
+        self.value = value
+        self.related = related
+
+
+class FieldSet:
+    def __init__(self, fields, default=None):
+        self.fields = fields
+        self.default = default or list(fields)
+
+    def parse(self, raw):
+        """Имена полей из параметра fields; ValueError на незнакомые."""
+        if not raw:
+            return self.default
+        names = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise ValueError(
+                'Неизвестные поля: %s. Доступны: %s.'
+                % (', '.join(unknown) or '-', ', '.join(self.fields))
+            )
+        return names
+
+    def apply(self, queryset, names, keys=()):
+        """Ограничивает queryset колонками полей и ключа пагинации."""
+        fields = [self.fields[name] for name in names]
+        related = {field.related for field in fields if field.related}
+        columns = {column for field in fields for column in field.columns}
+        columns.update(key for key in keys
+                       if key not in queryset.query.annotations)
+        # select_related() без аргументов тянет все связи - только явно.
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*sorted(related))
+        return queryset.only(*sorted(columns))
+
+    def dump(self, obj, names) -> dict:
+        return {name: self.fields[name].value(obj) for name in names}
+
+
+def _author(user):
+    return {'username': user.username, 'name': user.get_full_name()}
+
+
+def _group(group):
+    if group is None:
+        return None
+    return {'slug': group.slug, 'title': group.title}
+
+
+AUTHOR_COLUMNS = ('username', 'first_name', 'last_name')
+
+POST_FIELDS = FieldSet({
+    'id': Field(('id',), lambda post: post.pk),
+    'text': Field(('text',), lambda post: post.text),
+    'pub_date': Field(('pub_date',), lambda post: post.pub_date),
+    'image': Field(('image',),
+                   lambda post: post.image.url if post.image else None),
+    'comments_count': Field(('comments_count',),
+                            lambda post: post.comments_count),
+    'author': Field(tuple(f'author__{column}' for column in AUTHOR_COLUMNS),
+                    lambda post: _author(post.author), related='author'),
+    'group': Field(('group__slug', 'group__title'),
+                   lambda post: _group(post.group), related='group'),
+})
+
+COMMENT_FIELDS = FieldSet({
+    'id': Field(('id',), lambda comment: comment.pk),
+    'post': Field(('post',), lambda comment: comment.post_id),
+    'text': Field(('text',), lambda comment: comment.text),
+    'created': Field(('created',), lambda comment: comment.created),
+    'author': Field(tuple(f'author__{column}' for column in AUTHOR_COLUMNS),
+                    lambda comment: _author(comment.author),
+                    related='author'),
+})
+
+GROUP_FIELDS = FieldSet({
+    'id': Field(('id',), lambda group: group.pk),
+    'slug': Field(('slug',), lambda group: group.slug),
+    'title': Field(('title',), lambda group: group.title),
+    'description': Field(('description',), lambda group: group.description),
+    'posts_count': Field(('posts_count',), lambda group: group.posts_count),
+})
+
+FOLLOW_FIELDS = FieldSet({
+    'id': Field(('id',), lambda follow: follow.pk),
+    'author': Field(tuple(f'author__{column}' for column in AUTHOR_COLUMNS),
+                    lambda follow: _author(follow.author),
+                    related='author'),
+})
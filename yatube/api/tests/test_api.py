@@ -0,0 +1,130 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from http import HTTPStatus
+
+from posts.models import Comment, Follow, Group, Post
+from posts.tests.query_budget import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class ApiTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author',
+                                              first_name='Лев',
+                                              last_name='Толстой')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание группы'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for num in range(15):
+            Post.objects.create(author=cls.author,
+                                text=f'Тестовый пост {num}',
+                                group=None if num % 2 else cls.group)
+        cls.post = Post.objects.order_by('-id').first()
+        for num in range(3):
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text=f'Комментарий {num}')
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def collect(self, client, url):
+        """Все объекты списка, пройденные по ссылкам next."""
+        results, pages = [], 0
+        while url and pages < 20:
+            data = client.get(url).json()
+            results.extend(data['results'])
+            url = data['next']
+            pages += 1
+        return results
+
+    def test_posts_embed_author_and_group(self):
+        data = self.guest.get(reverse('api:posts')).json()
+        first = data['results'][0]
+        self.assertEqual(first['id'], self.post.pk)
+        self.assertEqual(first['author'],
+                         {'username': 'author', 'name': 'Лев Толстой'})
+        self.assertEqual(first['group'],
+                         {'slug': 'test_slug', 'title': 'Тестовая группа'})
+        self.assertEqual(first['comments_count'], 3)
+
+    def test_cursor_walks_every_post_once(self):
+        url = reverse('api:posts') + '?limit=4'
+        ids = [post['id'] for post in self.collect(self.guest, url)]
+        self.assertEqual(
+            ids, list(Post.objects.order_by('-pub_date', '-id')
+                      .values_list('id', flat=True))
+        )
+
+    def test_sparse_fields_limit_columns(self):
+        url = reverse('api:posts') + '?fields=id,text'
+        with CaptureQueriesContext(connection) as context:
+            data = self.guest.get(url).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        sql = context.captured_queries[-1]['sql']
+        self.assertNotIn('auth_user', sql)
+        self.assertNotIn('"image"', sql)
+
+    def test_unknown_field_and_bad_cursor(self):
+        for query in ('fields=secret', 'cursor=broken', 'limit=many'):
+            with self.subTest(query=query):
+                response = self.guest.get(reverse('api:posts') + '?' + query)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.BAD_REQUEST)
+                self.assertIn('detail', response.json())
+
+    def test_query_count_does_not_grow(self):
+        for url in (reverse('api:posts'),
+                    reverse('api:group_posts', args=[self.group.slug]),
+                    reverse('api:profile_posts', args=['author']),
+                    reverse('api:post_comments', args=[self.post.pk])):
+            for limit in (1, 5, 10):
+                with self.subTest(url=url, limit=limit):
+                    cache.clear()
+                    self.assertQueryBudget(3, self.guest,
+                                           f'{url}?limit={limit}')
+
+    def test_etag_not_modified(self):
+        url = reverse('api:post_detail', args=[self.post.pk])
+        response = self.guest.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        repeat = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(repeat.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(repeat.content, b'')
+
+    def test_private_endpoints(self):
+        for name in ('api:follow_posts', 'api:follows'):
+            with self.subTest(name=name):
+                response = self.guest.get(reverse(name))
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.UNAUTHORIZED)
+                response = self.reader_client.get(reverse(name))
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(response['Cache-Control'], 'private')
+        follows = self.reader_client.get(reverse('api:follows')).json()
+        self.assertEqual(follows['results'][0]['author']['username'],
+                         'author')
+        feed = self.collect(self.reader_client,
+                            reverse('api:follow_posts') + '?limit=4')
+        self.assertEqual(len(feed), Post.objects.count())
+
+    def test_not_found_and_method(self):
+        response = self.guest.get(reverse('api:post_detail', args=[0]))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.guest.post(reverse('api:posts'))
+        self.assertEqual(response.status_code,
+                         HTTPStatus.METHOD_NOT_ALLOWED)
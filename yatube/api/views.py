@@ -0,0 +1,159 @@
+"""
+JSON API только для чтения поверх тех же querysets, что и HTML-ленты.
+
+Списки листаются курсором (?cursor=), размер порции - ?limit=,
+набор полей - ?fields=. У каждого ответа сильный ETag по содержимому,
+повторный запрос с If-None-Match получает 304 без тела.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post
+from posts.utils import keyset_slice
+from posts.views import POST_ON_PAGE
+
+from .fields import COMMENT_FIELDS, FOLLOW_FIELDS, GROUP_FIELDS, POST_FIELDS
+
+User = get_user_model()
+
+MAX_LIMIT = 100
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+
+
+def _response(data, status=200):
+    body = json.dumps(data, cls=DjangoJSONEncoder,
+                      ensure_ascii=False).encode()
+    response = HttpResponse(body, status=status,
+                            content_type='application/json; charset=utf-8')
+    return response, body
+
+
+def api_view(private=False):
+    """
+    Оборачивает view, возвращающую данные, в JSON-ответ с ETag.
+    private - ответ зависит от пользователя и требует входа.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in ('GET', 'HEAD'):
+                    raise ApiError(405, 'Метод не поддерживается.')
+                if private and not request.user.is_authenticated:
+                    raise ApiError(401, 'Нужно войти.')
+                data = view(request, *args, **kwargs)
+            except Http404:
+                return _response({'detail': 'Не найдено.'}, 404)[0]
+            except ApiError as error:
+                return _response({'detail': str(error)}, error.status)[0]
+            response, body = _response(data)
+            etag = '"%s"' % hashlib.sha256(body).hexdigest()[:40]
+            response['ETag'] = etag
+            if private:
+                response['Cache-Control'] = 'private'
+            return get_conditional_response(
+                request, etag=etag, response=response
+            ) or response
+        return wrapper
+    return decorator
+
+
+def _limit(request) -> int:
+    raw = request.GET.get('limit')
+    if not raw:
+        return POST_ON_PAGE
+    try:
+        return min(max(int(raw), 1), MAX_LIMIT)
+    except ValueError:
+        raise ApiError(400, 'limit должен быть числом.')
+
+
+def _names(request, fieldset):
+    try:
+        return fieldset.parse(request.GET.get('fields'))
+    except ValueError as error:
+        raise ApiError(400, str(error))
+
+
+def _page(request, queryset, fieldset, keys=('pub_date', 'id')) -> dict:
+    """Порция объектов после курсора и ссылка на следующую."""
+    names = _names(request, fieldset)
+    queryset = fieldset.apply(queryset, names, keys)
+    try:
+        objects, cursor = keyset_slice(queryset, _limit(request),
+                                       fields=keys,
+                                       cursor=request.GET.get('cursor'))
+    except ValueError:
+        raise ApiError(400, 'Некорректный курсор.')
+    next_url = None
+    if cursor:
+        query = request.GET.copy()
+        query['cursor'] = cursor
+        next_url = f'{request.path}?{query.urlencode()}'
+    return {
+        'results': [fieldset.dump(obj, names) for obj in objects],
+        'next': next_url,
+    }
+
+
+@api_view()
+def posts(request):
+    return _page(request, Post.objects.for_feed(), POST_FIELDS)
+
+
+@api_view()
+def post_detail(request, post_id):
+    names = _names(request, POST_FIELDS)
+    post = get_object_or_404(
+        POST_FIELDS.apply(Post.objects.for_feed(), names), pk=post_id
+    )
+    return POST_FIELDS.dump(post, names)
+
+
+@api_view()
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.only('id'), pk=post_id)
+    return _page(request, Comment.objects.filter(post_id=post_id),
+                 COMMENT_FIELDS, keys=('created', 'id'))
+
+
+@api_view()
+def groups(request):
+    return _page(request, Group.objects.all(), GROUP_FIELDS, keys=('id',))
+
+
+@api_view()
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('id'), slug=slug)
+    return _page(request, group.posts.for_feed(), POST_FIELDS)
+
+
+@api_view()
+def profile_posts(request, username):
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    return _page(request, author.posts.for_feed(), POST_FIELDS)
+
+
+@api_view(private=True)
+def follow_posts(request):
+    return _page(request, timeline.feed(request.user).for_feed(),
+                 POST_FIELDS, keys=('feed_date', 'feed_id'))
+
+
+@api_view(private=True)
+def follows(request):
+    return _page(request, Follow.objects.filter(user=request.user),
+                 FOLLOW_FIELDS, keys=('id',))
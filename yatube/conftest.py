@@ -0,0 +1,9 @@
+import pytest
+
+from core.test_runner import override_caches
+
+
+@pytest.fixture(scope='session', autouse=True)
+def locmem_cache(django_test_environment):
+    with override_caches():
+        yield
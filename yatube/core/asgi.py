@@ -0,0 +1,475 @@
+"""
+ASGI-приложение для Django 2.2, в котором своего ASGI ещё нет.
+
+Тело запроса принимается, а ответ отдаётся в цикле событий, так что
+медленный клиент держит только соединение, а не поток. Синхронный стек
+Django (middleware и обычные view) выполняется в ограниченном пуле
+запросов. Асинхронные view (async_view) работают в цикле событий и
+отправляют блокирующую работу - запросы к базе, миниатюры, шаблоны -
+в отдельный пул sync_to_pool, поэтому число одновременных обращений
+к базе не растёт вместе с числом клиентов.
+
+Для асинхронной view middleware вызываются по фазам, как в старом
+MIDDLEWARE_CLASSES: process_request и process_view - одной задачей в
+пуле запросов, затем view в цикле событий, затем process_response -
+второй задачей. Пока view ждёт, поток пула свободен. Так можно, если
+все middleware из MIDDLEWARE построены на MiddlewareMixin; иначе view
+целиком выполняется в потоке пула, как обычная.
+
+Запуск: uvicorn yatube.asgi:application
+"""
+import asyncio
+import contextvars
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+import django
+from django.conf import settings
+from django.core import signals
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers import base
+from django.core.handlers.exception import response_for_exception
+from django.core.handlers.wsgi import (WSGIRequest, get_path_info,
+                                       get_script_name)
+from django.db import close_old_connections
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.urls import (Resolver404, get_resolver, set_script_prefix,
+                         set_urlconf)
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.log import log_response
+from django.utils.module_loading import import_string
+
+from core import profiling
+
+# Потоки, в которых идут middleware и синхронные view.
+REQUEST_THREADS = getattr(settings, 'ASGI_REQUEST_THREADS', 32)
+# Потоки для блокирующей работы асинхронных view.
+SYNC_THREADS = getattr(settings, 'ASGI_SYNC_THREADS', 4)
+# Ключ request.META с циклом событий, который обслуживает запрос.
+LOOP_KEY = 'asgi.loop'
+
+_pools = {}
+_pools_lock = threading.Lock()
+# Вне ASGIHandler sync_to_pool вызывает функции прямо в текущем потоке.
+_inline = contextvars.ContextVar('asgi_inline', default=False)
+
+
+def _pool(name, size) -> ThreadPoolExecutor:
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = ThreadPoolExecutor(
+                max_workers=size,
+                thread_name_prefix=f'asgi-{name}'
+            )
+        return _pools[name]
+
+
+def shutdown():
+    """Дожидается работы, уже отданной в пулы, и останавливает их."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+
+def _call(func, args, kwargs):
+    # Соединения с базой у каждого потока пула свои.
+    close_old_connections()
+    try:
+        with profiling.database():
+            return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def sync_to_pool(func, *args, **kwargs):
+    """
+    Выполняет блокирующую функцию в пуле SYNC_THREADS потоков;
+    contextvars запроса, например профиль, переходят вместе с ней.
+    """
+    if _inline.get():
+        return func(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _pool('sync', SYNC_THREADS),
+        partial(context.run, _call, func, args, kwargs)
+    )
+
+
+async def gather(*coroutines) -> list:
+    """asyncio.gather, а вне ASGIHandler - по очереди в текущем потоке."""
+    if _inline.get():
+        return [await coroutine for coroutine in coroutines]
+    return await asyncio.gather(*coroutines)
+
+
+def _run_inline(coroutine):
+    # Вне цикла событий sync_to_pool и gather не уступают управление,
+    # и корутина доходит до конца за один шаг.
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coroutine.close()
+    raise RuntimeError('Асинхронная view ждёт цикл событий вне ASGI.')
+
+
+def async_view(view):
+    """
+    Делает из асинхронной view обычную, которую принимает urls.py.
+
+    Под ASGIHandler корутину (wrapper.coroutine) запускает сам
+    обработчик в цикле событий. Обычный вызов - под WSGI и тестовым
+    клиентом - выполняет её целиком в текущем потоке без цикла событий:
+    sync_to_pool и gather там просто вызывают функции по очереди.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _inline.set(True)
+        try:
+            return _run_inline(view(request, *args, **kwargs))
+        finally:
+            _inline.reset(token)
+    wrapper.coroutine = view
+    return wrapper
+
+
+class AsyncStreamingHttpResponse(StreamingHttpResponse):
+    """
+    Потоковый ответ из асинхронного генератора. ASGIHandler читает его
+    в цикле событий, и открытое соединение не занимает поток; отдавать
+    такой ответ можно, только если в request.META есть LOOP_KEY.
+    """
+
+    def __init__(self, async_content, *args, **kwargs):
+        super().__init__((), *args, **kwargs)
+        self.async_content = async_content
+
+
+def _environ(scope, body, size) -> dict:
+    """WSGI environ из HTTP scope, чтобы запрос разобрал WSGIRequest."""
+    script_name = scope.get('root_path', '')
+    path = scope['path']
+    if script_name and path.startswith(script_name):
+        path = path[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path,
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'CONTENT_LENGTH': str(size),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = name if name == 'CONTENT_TYPE' else f'HTTP_{name}'
+        if key in environ:
+            value = f'{environ[key]},{value}'
+        environ[key] = value
+    return environ
+
+
+def _headers(response):
+    headers = [(name.encode('latin-1'), value.encode('latin-1'))
+               for name, value in response.items()]
+    for cookie in response.cookies.values():
+        headers.append((b'Set-Cookie', cookie.output(header='').strip()
+                        .encode('latin-1')))
+    return headers
+
+
+class ASGIHandler(base.BaseHandler):
+    request_class = WSGIRequest
+
+    def __init__(self):
+        super().__init__()
+        self.load_middleware()
+
+    def load_middleware(self):
+        super().load_middleware()
+        # Экземпляры для вызова по фазам; None - если какой-то middleware
+        # умеет только __call__, и фазы не получатся.
+        self._phased = []
+        for middleware_path in settings.MIDDLEWARE:
+            middleware = import_string(middleware_path)
+            if not (isinstance(middleware, type)
+                    and issubclass(middleware, MiddlewareMixin)):
+                self._phased = None
+                return
+            try:
+                self._phased.append(middleware())
+            except MiddlewareNotUsed:
+                pass
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Тип соединения {scope["type"]} '
+                             'не поддерживается.')
+        body, size = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        environ = _environ(scope, body, size)
+        environ[LOOP_KEY] = loop
+        requests = _pool('request', REQUEST_THREADS)
+        try:
+            if self.is_async(environ):
+                response, content = await self.respond_async(environ)
+            else:
+                response, content = await loop.run_in_executor(
+                    requests, self.respond, environ
+                )
+        finally:
+            body.close()
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': _headers(response),
+        })
+        if content is not None:
+            await send({'type': 'http.response.body', 'body': content})
+            return
+        if isinstance(response, AsyncStreamingHttpResponse):
+            try:
+                await self.stream_async(response, receive, send)
+            finally:
+                await loop.run_in_executor(requests, response.close)
+            return
+        # Потоковый ответ читается из пула по куску.
+        chunks = iter(response)
+        try:
+            while True:
+                chunk = await loop.run_in_executor(requests, next,
+                                                   chunks, None)
+                if chunk is None:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk,
+                            'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            await loop.run_in_executor(requests, response.close)
+
+    async def stream_async(self, response, receive, send):
+        """Отдаёт асинхронный генератор, пока клиент не отключится."""
+        content = response.async_content
+
+        async def pump():
+            async for chunk in content:
+                await send({'type': 'http.response.body',
+                            'body': response.make_bytes(chunk),
+                            'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        async def disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        tasks = [asyncio.ensure_future(pump()),
+                 asyncio.ensure_future(disconnect())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await content.aclose()
+
+    async def read_body(self, receive):
+        """Тело запроса в памяти или во временном файле и его размер."""
+        body = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, mode='w+b'
+        )
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None, 0
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        size = body.tell()
+        body.seek(0)
+        return body, size
+
+    def respond(self, environ):
+        """То же, что WSGIHandler.__call__; выполняется в пуле запросов."""
+        set_script_prefix(get_script_name(environ))
+        signals.request_started.send(sender=self.__class__, environ=environ)
+        try:
+            request = self.request_class(environ)
+        except UnicodeDecodeError:
+            response = HttpResponseBadRequest()
+        else:
+            response = self.get_response(request)
+        return self.content(response)
+
+    def content(self, response):
+        if response.streaming:
+            return response, None
+        content = response.content
+        response.close()
+        return response, content
+
+    def is_async(self, environ) -> bool:
+        """Ведёт ли запрос в асинхронную view, вызываемую по фазам."""
+        if self._phased is None:
+            return False
+        try:
+            match = get_resolver().resolve(get_path_info(environ))
+        except Resolver404:
+            return False
+        return hasattr(match.func, 'coroutine')
+
+    async def respond_async(self, environ):
+        """
+        Асинхронная view в цикле событий; middleware до и после неё -
+        двумя задачами в пуле запросов, в общем для запроса контексте.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        requests = _pool('request', REQUEST_THREADS)
+
+        def run(func, *args):
+            return loop.run_in_executor(
+                requests, partial(context.run, _call, func, args, {})
+            )
+
+        request, done, response, match = await run(
+            self.request_phase, environ
+        )
+        error = None
+        if match is not None:
+            callback, args, kwargs = match
+            view = callback.coroutine(request, *args, **kwargs)
+            try:
+                # Задача получает копию контекста запроса: профиль,
+                # состояние реплик.
+                response = await context.run(loop.create_task, view)
+            except Exception as exc:
+                error = exc
+        return await run(self.response_phase, request, done, response,
+                         match, error)
+
+    def request_phase(self, environ):
+        """
+        process_request и process_view; возвращает запрос, сколько
+        middleware уже вызвано, готовый ответ или view для вызова.
+        """
+        set_script_prefix(get_script_name(environ))
+        signals.request_started.send(sender=self.__class__, environ=environ)
+        try:
+            request = self.request_class(environ)
+        except UnicodeDecodeError:
+            return None, 0, HttpResponseBadRequest(), None
+        done = 0
+        try:
+            for middleware in self._phased:
+                response = None
+                if hasattr(middleware, 'process_request'):
+                    response = middleware.process_request(request)
+                done += 1
+                if response:
+                    return request, done, response, None
+            urlconf = getattr(request, 'urlconf', settings.ROOT_URLCONF)
+            set_urlconf(urlconf)
+            match = get_resolver(urlconf).resolve(request.path_info)
+            request.resolver_match = match
+            callback, args, kwargs = match
+            for middleware_method in self._view_middleware:
+                response = middleware_method(request, callback, args,
+                                             kwargs)
+                if response:
+                    return request, done, response, None
+        except Exception as exc:
+            return request, done, response_for_exception(request, exc), None
+        if hasattr(callback, 'coroutine'):
+            return request, done, None, match
+        # urlconf сменили middleware, и view оказалась обычной.
+        response = error = None
+        try:
+            response = callback(request, *args, **kwargs)
+        except Exception as exc:
+            error = exc
+        return (request, done,
+                self.view_response(request, callback, response, error), None)
+
+    def view_response(self, request, callback, response, error=None):
+        """Конец BaseHandler._get_response: ошибки view и TemplateResponse."""
+        try:
+            if error is not None:
+                for middleware_method in self._exception_middleware:
+                    response = middleware_method(request, error)
+                    if response:
+                        break
+                else:
+                    raise error
+            if response is None:
+                raise ValueError(
+                    f"The view {callback.__module__}.{callback.__name__} "
+                    "didn't return an HttpResponse object. "
+                    "It returned None instead."
+                )
+            if hasattr(response, 'render') and callable(response.render):
+                for middleware_method in self._template_response_middleware:
+                    response = middleware_method(request, response)
+                response = response.render()
+        except Exception as exc:
+            response = response_for_exception(request, exc)
+        return response
+
+    def response_phase(self, request, done, response, match, error):
+        """process_response в обратном порядке и тело ответа."""
+        if match is not None:
+            response = self.view_response(request, match.func, response,
+                                          error)
+        for middleware in reversed(self._phased[:done]):
+            if hasattr(middleware, 'process_response'):
+                try:
+                    response = middleware.process_response(request,
+                                                           response)
+                except Exception as exc:
+                    response = response_for_exception(request, exc)
+        if request is not None:
+            response._closable_objects.append(request)
+            if response.status_code >= 400:
+                log_response('%s: %s', response.reason_phrase, request.path,
+                             response=response, request=request)
+        return self.content(response)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return ASGIHandler()
@@ -0,0 +1,98 @@
+"""
+Pub/sub внутри процесса: публикация раздаёт сообщение всем подписчикам
+каналов в этом процессе.
+
+Подписчик ждёт сообщения либо в потоке (wait), либо в цикле событий
+ASGI (wait_async) - тогда соединение не занимает поток. Сообщения,
+пришедшие между ожиданиями, копятся в ограниченном буфере.
+"""
+import asyncio
+import threading
+from collections import defaultdict, deque
+
+# Сколько последних сообщений держит подписчик, который не успел их забрать.
+BUFFER = 100
+
+
+class Subscription:
+    def __init__(self, broker, channels, loop=None):
+        self.broker = broker
+        self.channels = tuple(channels)
+        self.loop = loop
+        self._messages = deque(maxlen=BUFFER)
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event() if loop else threading.Event()
+
+    def deliver(self, message):
+        with self._lock:
+            self._messages.append(message)
+        if self.loop is None:
+            self._ready.set()
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._ready.set)
+
+    def drain(self) -> list:
+        """Забирает накопленные сообщения."""
+        # Флаг сбрасывается до копирования: сообщение, пришедшее после,
+        # снова его поставит.
+        self._ready.clear()
+        with self._lock:
+            messages = list(self._messages)
+            self._messages.clear()
+        return messages
+
+    def wait(self, timeout) -> list:
+        self._ready.wait(timeout)
+        return self.drain()
+
+    async def wait_async(self, timeout) -> list:
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.drain()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    def __init__(self):
+        self._channels = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels, loop=None) -> Subscription:
+        """
+        Подписка на каналы. loop - цикл событий, в котором подписчик
+        будет ждать через wait_async.
+        """
+        subscription = Subscription(self, channels, loop)
+        with self._lock:
+            for channel in subscription.channels:
+                self._channels[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[channel]
+
+    def publish(self, channel, message) -> int:
+        """Раздаёт сообщение подписчикам канала; возвращает их число."""
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+        return len(subscribers)
+
+    def subscribers(self, channel) -> int:
+        with self._lock:
+            return len(self._channels.get(channel, ()))
+
+
+broker = Broker()
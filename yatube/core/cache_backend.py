@@ -0,0 +1,369 @@
+"""
+Общий для всех процессов кеш в файле SQLite (режим WAL).
+
+Все воркеры на одном сервере видят одни и те же ключи, поэтому
+поколения и блокировки кеша страниц работают между процессами без
+memcached или Redis. Размер хранилища ограничен в байтах, при
+переполнении вытесняются давно не читавшиеся ключи (LRU).
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backend.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {'MAX_SIZE': 64 * 1024 * 1024},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core import profiling
+
+MAX_SIZE = 64 * 1024 * 1024
+# Время последнего чтения обновляется не чаще, чем раз в столько секунд.
+# Чтение только запоминает ключ, а записывает время та транзакция, которая
+# и так берёт блокировку записи: set, add или сброс статистики.
+TOUCH_INTERVAL = 1
+# Статистика копится в процессе и сбрасывается в файл пачками.
+STATS_FLUSH_EVERY = 100
+STATS = ('hits', 'misses')
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL,'
+    ' size INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE TABLE IF NOT EXISTS stats ('
+    ' name TEXT PRIMARY KEY,'
+    ' value INTEGER NOT NULL)',
+    "INSERT OR IGNORE INTO stats VALUES"
+    " ('hits', 0), ('misses', 0), ('evictions', 0), ('size', 0)",
+)
+
+
+def _dump(value):
+    # Целые числа (поколения, счётчики) хранятся без pickle.
+    if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _load(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+def _size(key, value) -> int:
+    return len(key) + (8 if isinstance(value, int) else len(value))
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', MAX_SIZE))
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._pending = dict.fromkeys(STATS, 0)
+        self._pending_ops = 0
+        self._touched = {}
+
+    # Соединения
+
+    def _connection(self):
+        # После fork соединение родителя использовать нельзя.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = self._connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    def _connect(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self._path, timeout=30,
+                                     isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('PRAGMA busy_timeout=30000')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    @contextmanager
+    def _write(self):
+        """Транзакция, сразу берущая блокировку записи."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    # Статистика
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._pending[name] += amount
+            self._pending_ops += 1
+            flush = self._pending_ops >= STATS_FLUSH_EVERY
+        if flush:
+            self._flush_stats()
+
+    def _flush_stats(self):
+        with self._stats_lock:
+            pending = self._pending
+            self._pending = dict.fromkeys(STATS, 0)
+            self._pending_ops = 0
+        with self._write() as connection:
+            connection.executemany(
+                'UPDATE stats SET value = value + ? WHERE name = ?',
+                [(amount, name) for name, amount in pending.items()
+                 if amount]
+            )
+            self._apply_touches(connection)
+
+    def _touch(self, keys, now):
+        with self._stats_lock:
+            self._touched.update(dict.fromkeys(keys, now))
+
+    def _apply_touches(self, connection):
+        """Записывает накопленное время чтения внутри транзакции записи."""
+        with self._stats_lock:
+            touched = self._touched
+            self._touched = {}
+        if touched:
+            connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?',
+                [(now, key) for key, now in touched.items()]
+            )
+
+    def stats(self) -> dict:
+        """Попадания, промахи, вытеснения, занятый объём и число ключей."""
+        self._flush_stats()
+        connection = self._connection()
+        stats = dict(connection.execute('SELECT name, value FROM stats'))
+        stats['entries'] = connection.execute(
+            'SELECT COUNT(*) FROM cache'
+        ).fetchone()[0]
+        return stats
+
+    # Внутренние операции
+
+    def _delete_rows(self, connection, keys):
+        freed = 0
+        for key in keys:
+            row = connection.execute(
+                'SELECT size FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+                freed += row[0]
+        if freed:
+            connection.execute(
+                "UPDATE stats SET value = value - ? WHERE name = 'size'",
+                (freed,)
+            )
+        return freed
+
+    def _put(self, connection, key, value, expires, now):
+        value = _dump(value)
+        size = _size(key, value)
+        freed = self._delete_rows(connection, [key])
+        connection.execute(
+            'INSERT INTO cache (key, value, expires, accessed, size)'
+            ' VALUES (?, ?, ?, ?, ?)',
+            (key, value, expires, now, size)
+        )
+        connection.execute(
+            "UPDATE stats SET value = value + ? WHERE name = 'size'",
+            (size,)
+        )
+        return size - freed
+
+    def _evict(self, connection, now):
+        self._apply_touches(connection)
+        total = connection.execute(
+            "SELECT value FROM stats WHERE name = 'size'"
+        ).fetchone()[0]
+        if total <= self._max_size:
+            return
+        expired = [key for key, in connection.execute(
+            'SELECT key FROM cache WHERE expires <= ?', (now,)
+        )]
+        total -= self._delete_rows(connection, expired)
+        evicted = 0
+        while total > self._max_size:
+            rows = connection.execute(
+                'SELECT key FROM cache ORDER BY accessed LIMIT 64'
+            ).fetchall()
+            if not rows:
+                break
+            for key, in rows:
+                total -= self._delete_rows(connection, [key])
+                evicted += 1
+                if total <= self._max_size:
+                    break
+        if evicted:
+            connection.execute(
+                "UPDATE stats SET value = value + ? WHERE name = 'evictions'",
+                (evicted,)
+            )
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    # API кеша Django
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and (row[0] is None or row[0] > now):
+                return False
+            self._put(connection, key, value, self._expires(timeout), now)
+            self._evict(connection, now)
+        return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._get_many([key]).get(key, default)
+
+    def _get_many(self, keys):
+        with profiling.timed('cache', len(keys)):
+            found = self._select(keys)
+        profiling.count('cache_hit', len(found))
+        profiling.count('cache_miss', len(keys) - len(found))
+        return found
+
+    def _select(self, keys):
+        connection = self._connection()
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = connection.execute(
+            f'SELECT key, value, expires, accessed FROM cache'
+            f' WHERE key IN ({placeholders})',
+            keys
+        ).fetchall()
+        found, touched = {}, []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                continue
+            found[key] = _load(value)
+            if accessed < now - TOUCH_INTERVAL:
+                touched.append(key)
+        if touched:
+            self._touch(touched, now)
+        if found:
+            self._count('hits', len(found))
+        if len(found) < len(keys):
+            self._count('misses', len(keys) - len(found))
+        return found
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        for key in made:
+            self.validate_key(key)
+        if not made:
+            return {}
+        found = self._get_many(list(made))
+        return {made[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._write() as connection:
+            self._put(connection, key, value, self._expires(timeout), now)
+            self._evict(connection, now)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        expires = self._expires(timeout)
+        with self._write() as connection:
+            for key, value in data.items():
+                key = self.make_key(key, version=version)
+                self.validate_key(key)
+                self._put(connection, key, value, expires, now)
+            self._evict(connection, now)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._write() as connection:
+            return connection.execute(
+                'UPDATE cache SET expires = ?, accessed = ?'
+                ' WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self._expires(timeout), now, key, now)
+            ).rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно для всех процессов, работающих с этим файлом."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                raise ValueError("Key '%s' not found" % key)
+            # Блокировка записи уже взята, чтение и запись атомарны.
+            value = _load(row[0]) + delta
+            self._put(connection, key, value, row[1], now)
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._write() as connection:
+            return bool(self._delete_rows(connection, [key]))
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        with self._write() as connection:
+            self._delete_rows(connection, keys)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ?'
+            ' AND (expires IS NULL OR expires > ?)',
+            (key, time.time())
+        ).fetchone() is not None
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+            connection.execute(
+                "UPDATE stats SET value = 0 WHERE name = 'size'"
+            )
+
+    def close(self, **kwargs):
+        # Соединение живёт всё время жизни потока, как у LocMemCache.
+        pass
@@ -0,0 +1,9 @@
+from django.conf import settings
+
+
+def fragment_cache(request) -> dict:
+    """Добавляет время жизни фрагментного кеша шаблонов."""
+
+    return {
+        'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+    }
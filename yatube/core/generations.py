@@ -0,0 +1,85 @@
+"""
+Поколения кеша для областей сайта: общая лента, группа, автор, пост.
+
+Номер поколения входит в ключ фрагментного кеша, поэтому запись в
+области делает старые фрагменты недостижимыми сразу, а не по TTL.
+С репликами (core.replicas) поколение сбрасывается ещё раз через
+REPLICA_MAX_LAG секунд: фрагменты, собранные за это время по отстающей
+реплике, тоже устаревают.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = 'generation'
+
+
+def _key(scope: str, pk=None) -> str:
+    if pk is None:
+        return f'{KEY_PREFIX}:{scope}'
+    return f'{KEY_PREFIX}:{scope}:{pk}'
+
+
+def _initial() -> int:
+    # После вытеснения счётчика из кеша не повторяем старые номера.
+    return int(time.time() * 1000)
+
+
+def get(scope: str, pk=None) -> int:
+    key = _key(scope, pk)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _initial(), None)
+        value = cache.get(key)
+    return value
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial(), None)
+
+
+def bump(scope: str, pk=None):
+    key = _key(scope, pk)
+    _incr(key)
+    if settings.DATABASE_REPLICAS:
+        _bump_later(key)
+
+
+# Ключ -> когда сбросить его ещё раз; один таймер на процесс.
+_later = {}
+_later_lock = threading.Lock()
+_timer = None
+
+
+def _bump_later(key):
+    due = time.monotonic() + settings.REPLICA_MAX_LAG
+    with _later_lock:
+        _later[key] = due
+        if _timer is None:
+            _schedule(settings.REPLICA_MAX_LAG)
+
+
+def _schedule(delay):
+    global _timer
+    _timer = threading.Timer(delay, _bump_due)
+    _timer.daemon = True
+    _timer.start()
+
+
+def _bump_due():
+    global _timer
+    now = time.monotonic()
+    with _later_lock:
+        due = [key for key, at in _later.items() if at <= now]
+        for key in due:
+            del _later[key]
+        _timer = None
+        if _later:
+            _schedule(max(min(_later.values()) - now, 0))
+    for key in due:
+        _incr(key)
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+BACKENDS = (
+    ('django.db.backends.sqlite3', 'sqlite3 Django'),
+    ('core.sqlite_backend', 'core.sqlite_backend'),
+)
+POSTS = 100
+
+
+def _setup(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute('CREATE TABLE bench_post '
+                       '(id INTEGER PRIMARY KEY, comments INTEGER NOT NULL)')
+        cursor.execute('CREATE TABLE bench_comment (id INTEGER PRIMARY KEY,'
+                       ' post_id INTEGER NOT NULL, text TEXT NOT NULL)')
+        cursor.executemany('INSERT INTO bench_post VALUES (%s, 0)',
+                           [(pk,) for pk in range(1, POSTS + 1)])
+
+
+def _comment(alias, num):
+    """Как add_comment: чтение поста, комментарий и счётчик в транзакции."""
+    post_id = num % POSTS + 1
+    with transaction.atomic(using=alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT comments FROM bench_post WHERE id = %s',
+                           [post_id])
+            cursor.fetchone()
+            cursor.execute('INSERT INTO bench_comment (post_id, text) '
+                           'VALUES (%s, %s)', [post_id, f'Комментарий {num}'])
+            cursor.execute('UPDATE bench_post SET comments = comments + 1 '
+                           'WHERE id = %s', [post_id])
+
+
+class Command(BaseCommand):
+    help = ('Замеряет пропускную способность записи в SQLite при '
+            'одновременных писателях: стандартный бэкенд Django против '
+            'core.sqlite_backend.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8,
+                            help='Потоков-писателей.')
+        parser.add_argument('--writes', type=int, default=200,
+                            help='Транзакций на писателя.')
+
+    def handle(self, *args, **options):
+        if min(options['writers'], options['writes']) < 1:
+            raise CommandError('Нужны хотя бы один писатель и одна запись.')
+        directory = tempfile.mkdtemp(prefix='benchmark-writes-')
+        try:
+            for num, (engine, label) in enumerate(BACKENDS):
+                alias = f'benchmark_writes_{num}'
+                connections.databases[alias] = {
+                    'ENGINE': engine,
+                    'NAME': os.path.join(directory, f'{num}.sqlite3'),
+                }
+                try:
+                    self.report(label, self.run(alias, options))
+                finally:
+                    connections[alias].close()
+                    del connections.databases[alias]
+                    if hasattr(connections._connections, alias):
+                        delattr(connections._connections, alias)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def run(self, alias, options) -> dict:
+        _setup(alias)
+        start = threading.Barrier(options['writers'])
+        done, errors = [], []
+
+        def writer(number):
+            start.wait()
+            try:
+                for num in range(options['writes']):
+                    try:
+                        _comment(alias, number * options['writes'] + num)
+                    except OperationalError:
+                        errors.append(num)
+                    else:
+                        done.append(num)
+            finally:
+                connections[alias].close()
+
+        threads = [threading.Thread(target=writer, args=(number,))
+                   for number in range(options['writers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return {'committed': len(done), 'locked': len(errors),
+                'elapsed': elapsed}
+
+    def report(self, label, result):
+        self.stdout.write(
+            f'{label:<22} транзакций {result["committed"]:>6} '
+            f'"database is locked" {result["locked"]:>5} '
+            f'{result["committed"] / result["elapsed"]:>9.0f} в секунду'
+        )
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файл реплики - локальная '
+            'замена репликации для core.replicas.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default=None,
+                            help='Псевдоним реплики (первый из '
+                                 'DATABASE_REPLICAS).')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Повторять каждые N секунд, имитируя '
+                                 'отставание реплики.')
+
+    def handle(self, *args, **options):
+        alias = options['alias']
+        if alias is None:
+            if not settings.DATABASE_REPLICAS:
+                raise CommandError('DATABASE_REPLICAS пуст.')
+            alias = settings.DATABASE_REPLICAS[0]
+        if alias not in settings.DATABASES:
+            raise CommandError(f'Нет базы {alias} в DATABASES.')
+        if connections[alias].vendor != 'sqlite':
+            raise CommandError('Копировать можно только в SQLite; у '
+                               'настоящей реплики своя репликация.')
+        while True:
+            replicas.sync_sqlite(alias)
+            self.stdout.write(f'{alias}: скопирована {time.strftime("%X")}')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,110 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.utils.deprecation import MiddlewareMixin
+
+from core import generations
+
+KEY_PREFIX = 'page'
+# Сколько раз ждать, пока другой процесс отрисует страницу.
+LOCK_POLLS = 20
+LOCK_POLL_INTERVAL = 0.05
+
+
+class AnonymousPageCacheMiddleware(MiddlewareMixin):
+    """
+    Кеш целых страниц для анонимных GET-запросов.
+
+    Стоит до SessionMiddleware, поэтому попадание в кеш не трогает ни
+    сессию, ни базу. Ключ - путь с query string и поколение 'pages',
+    которое сбрасывается сигналами при любой записи в модели постов.
+    Пересборку устаревшей страницы выполняет один процесс: остальные
+    в это время отдают устаревшую копию или ждут готовую. Страница
+    хранится вместе с ETag, и клиент с совпадающим If-None-Match
+    получает 304 без тела.
+    """
+
+    def process_request(self, request):
+        if not self._cacheable_request(request):
+            return None
+        key = self._key(request)
+        entry = cache.get(key)
+        if entry is not None and entry[0] > time.time():
+            return self._build(request, entry, 'hit')
+
+        if not cache.add(f'{key}:lock', 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+            if entry is not None:
+                return self._build(request, entry, 'stale')
+            for _ in range(LOCK_POLLS):
+                time.sleep(LOCK_POLL_INTERVAL)
+                entry = cache.get(key)
+                if entry is not None:
+                    return self._build(request, entry, 'hit')
+            return None
+        # Блокировка наша: страницу сохранит и отпустит process_response.
+        request._page_cache_key = key
+        return None
+
+    def process_response(self, request, response):
+        key = getattr(request, '_page_cache_key', None)
+        if key is None:
+            return response
+        try:
+            if self._cacheable_response(request, response):
+                self._store(key, response)
+                response['X-Page-Cache'] = 'miss'
+        finally:
+            cache.delete(f'{key}:lock')
+        return response
+
+    def _cacheable_request(self, request) -> bool:
+        if not settings.PAGE_CACHE_ENABLED:
+            return False
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match.view_name in settings.PAGE_CACHE_VIEWS
+
+    def _cacheable_response(self, request, response) -> bool:
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED')
+            and 'private' not in response.get('Cache-Control', '')
+        )
+
+    def _key(self, request) -> str:
+        generation = generations.get('pages')
+        return f'{KEY_PREFIX}:{generation}:{request.get_full_path()}'
+
+    def _store(self, key, response):
+        if not response.has_header('ETag'):
+            set_response_etag(response)
+        expires = time.time() + settings.PAGE_CACHE_TIMEOUT
+        cache.set(
+            key,
+            (expires, response.status_code, list(response.items()),
+             response.content),
+            settings.PAGE_CACHE_TIMEOUT + settings.PAGE_CACHE_STALE_TIMEOUT
+        )
+
+    def _build(self, request, entry, state) -> HttpResponse:
+        _, status, headers, content = entry
+        response = HttpResponse(content, status=status)
+        for name, value in headers:
+            response[name] = value
+        response = get_conditional_response(
+            request, etag=response.get('ETag'), response=response
+        )
+        response['X-Page-Cache'] = state
+        return response
@@ -0,0 +1,221 @@
+"""
+Профилирование доли запросов.
+
+ProfilingMiddleware для доли PROFILING_SAMPLE_RATE запросов собирает
+число и время SQL-запросов, попадания и промахи кеша, время миниатюр и
+отрисовки шаблонов. Итог уходит в заголовок Server-Timing и строкой
+JSON в лог 'yatube.profiling'. Если задан PROFILING_CPROFILE_THRESHOLD,
+выбранные запросы идут под cProfile, и профиль тех, что дольше порога
+в миллисекундах, сохраняется в PROFILING_CPROFILE_DIR.
+
+Замеряемый код отчитывается через timed() и count(); вне выбранного
+запроса они ничего не делают. Профиль запроса лежит в contextvar,
+поэтому его видят и асинхронные view, и потоки sync_to_pool.
+"""
+import cProfile
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends import django as django_backend
+from django.template.exceptions import TemplateDoesNotExist
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import slugify
+
+logger = logging.getLogger('yatube.profiling')
+
+# Метрика -> имя в Server-Timing и подпись к счётчику.
+METRICS = (
+    ('db', 'db', 'queries'),
+    ('cache', 'cache', None),
+    ('thumbnail', 'thumb', 'queued'),
+    ('template', 'tpl', 'renders'),
+)
+
+_current = contextvars.ContextVar('profiling_recorder', default=None)
+
+
+class Recorder:
+    """Суммы времени и счётчики метрик одного запроса."""
+
+    def __init__(self):
+        self.timings = defaultdict(float)
+        self.counts = Counter()
+        # Потоки sync_to_pool пишут в один профиль одновременно.
+        self._lock = threading.Lock()
+
+    def add(self, metric, seconds=None, amount=1):
+        with self._lock:
+            if seconds is not None:
+                self.timings[metric] += seconds
+            self.counts[metric] += amount
+
+    def summary(self) -> dict:
+        with self._lock:
+            summary = {f'{metric}_ms': round(seconds * 1000, 3)
+                       for metric, seconds in self.timings.items()}
+            summary.update(self.counts)
+        return summary
+
+
+def active() -> bool:
+    return _current.get() is not None
+
+
+def count(metric, amount=1):
+    """Прибавляет amount к счётчику метрики без времени."""
+    recorder = _current.get()
+    if recorder is not None and amount:
+        recorder.add(metric, amount=amount)
+
+
+@contextmanager
+def timed(metric, amount=1):
+    """Время блока прибавляется к метрике, счётчик - на amount."""
+    recorder = _current.get()
+    if recorder is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add(metric, time.perf_counter() - started, amount)
+
+
+def _timed_query(execute, sql, params, many, context):
+    with timed('db'):
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def database():
+    """Замеряет запросы всех соединений текущего потока."""
+    if not active():
+        yield
+        return
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(_timed_query))
+        yield
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Бэкенд шаблонов Django, который замеряет отрисовку."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+def server_timing(summary, total) -> str:
+    parts = []
+    for metric, name, noun in METRICS:
+        if f'{metric}_ms' not in summary:
+            continue
+        part = f'{name};dur={summary[f"{metric}_ms"]:.1f}'
+        if metric == 'cache':
+            part += (f';desc="{summary.get("cache_hit", 0)} hit, '
+                     f'{summary.get("cache_miss", 0)} miss"')
+        elif noun:
+            part += f';desc="{summary.get(metric, 0)} {noun}"'
+        parts.append(part)
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """
+    Профилирует случайную долю запросов. Стоит первым, чтобы в total
+    попадали и остальные middleware, включая кеш страниц.
+
+    Асинхронные view под ASGI вызывают process_request и
+    process_response из разных потоков, поэтому cProfile и замер SQL
+    самих middleware есть только у обычного вызова через __call__;
+    SQL view там замеряют потоки core.asgi.
+    """
+
+    def __call__(self, request):
+        self.process_request(request)
+        if not hasattr(request, '_profiling'):
+            return self.get_response(request)
+        threshold = settings.PROFILING_CPROFILE_THRESHOLD
+        profiler = cProfile.Profile() if threshold is not None else None
+        try:
+            with database():
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        except BaseException:
+            _current.reset(request._profiling[1])
+            raise
+        total = self.finish(request, response)
+        if profiler is not None and total * 1000 >= threshold:
+            self.dump(profiler, request)
+        return response
+
+    def process_request(self, request):
+        rate = settings.PROFILING_SAMPLE_RATE
+        if not rate or random.random() >= rate:
+            return
+        recorder = Recorder()
+        request._profiling = (recorder, _current.set(recorder),
+                              time.perf_counter())
+
+    def process_response(self, request, response):
+        if hasattr(request, '_profiling'):
+            self.finish(request, response)
+        return response
+
+    def finish(self, request, response):
+        """Server-Timing и строка лога; возвращает время запроса."""
+        recorder, token, started = request._profiling
+        _current.reset(token)
+        total = time.perf_counter() - started
+        summary = recorder.summary()
+        response['Server-Timing'] = server_timing(summary, total)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 3),
+            **summary,
+        }, ensure_ascii=False, sort_keys=True))
+        return total
+
+    def dump(self, profiler, request):
+        """Сохраняет профиль медленного запроса для pstats/snakeviz."""
+        directory = settings.PROFILING_CPROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        name = slugify(request.path) or 'index'
+        path = os.path.join(
+            directory,
+            f'{int(time.time() * 1000)}-{request.method}-{name}-'
+            f'{os.getpid()}-{threading.get_ident()}.prof'
+        )
+        profiler.dump_stats(path)
+        logger.info(json.dumps({'path': request.get_full_path(),
+                                'profile': path}, ensure_ascii=False))
@@ -0,0 +1,197 @@
+"""
+Чтение с реплик базы, запись - в основную.
+
+ReplicaMiddleware разрешает читать с реплик из DATABASE_REPLICAS только
+внутри GET- и HEAD-запросов; команды, сигналы вне запроса и всё внутри
+транзакции читают основную базу. После любой записи запрос до конца
+читает основную базу, а пользователь получает куку, с которой его
+запросы ещё REPLICA_STICKY_SECONDS идут в основную базу: он сразу видит
+свой пост или комментарий, даже если реплика отстаёт.
+
+Отставание реплики проверяется не чаще раза в REPLICA_LAG_CHECK_INTERVAL
+секунд; реплика, отставшая больше REPLICA_MAX_LAG или недоступная, не
+используется. Локально реплику заменяет второй файл SQLite, который
+обновляет manage.py sync_replica.
+"""
+import contextvars
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.deprecation import MiddlewareMixin
+
+COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+SYNC_TABLE = 'replica_sync'
+
+_state = contextvars.ContextVar('replica_state', default=None)
+# Псевдоним реплики -> (время проверки, отставание в секундах или None).
+_lag = {}
+_lag_lock = threading.Lock()
+
+
+class _State:
+    def __init__(self, replicas):
+        self.replicas = replicas
+        self.wrote = False
+
+
+def _sqlite_lag(cursor):
+    cursor.execute(f'SELECT MAX(synced_at) FROM {SYNC_TABLE}')
+    synced_at = cursor.fetchone()[0]
+    return None if synced_at is None else max(time.time() - synced_at, 0)
+
+
+def _postgresql_lag(cursor):
+    cursor.execute(
+        'SELECT CASE WHEN pg_last_wal_receive_lsn() ='
+        ' pg_last_wal_replay_lsn() THEN 0 ELSE EXTRACT(EPOCH FROM'
+        ' now() - pg_last_xact_replay_timestamp()) END'
+    )
+    lag = cursor.fetchone()[0]
+    return None if lag is None else float(lag)
+
+
+def _mysql_lag(cursor):
+    cursor.execute('SHOW SLAVE STATUS')
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    columns = [column[0] for column in cursor.description]
+    lag = dict(zip(columns, row)).get('Seconds_Behind_Master')
+    return None if lag is None else float(lag)
+
+
+LAG_QUERIES = {
+    'sqlite': _sqlite_lag,
+    'postgresql': _postgresql_lag,
+    'mysql': _mysql_lag,
+}
+
+
+def lag(alias):
+    """Отставание реплики в секундах; None - неизвестно или недоступна."""
+    connection = connections[alias]
+    query = LAG_QUERIES.get(connection.vendor)
+    if query is None:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            return query(cursor)
+    except DatabaseError:
+        return None
+
+
+def healthy(alias) -> bool:
+    now = time.time()
+    with _lag_lock:
+        checked_at, value = _lag.get(alias, (0, None))
+    if now - checked_at >= settings.REPLICA_LAG_CHECK_INTERVAL:
+        value = lag(alias)
+        with _lag_lock:
+            _lag[alias] = (now, value)
+    return value is not None and value <= settings.REPLICA_MAX_LAG
+
+
+def reset():
+    """Забывает результаты проверок отставания."""
+    with _lag_lock:
+        _lag.clear()
+
+
+def replica():
+    """Реплика для чтения в этом запросе или None - читать основную."""
+    state = _state.get()
+    if state is None or not state.replicas:
+        return None
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return None
+    aliases = [alias for alias in settings.DATABASE_REPLICAS
+               if healthy(alias)]
+    return random.choice(aliases) if aliases else None
+
+
+def key_suffix() -> str:
+    """Добавка к ключам кеша того, что собрано по репликам."""
+    state = _state.get()
+    return ':replica' if state is not None and state.replicas else ''
+
+
+def sync_sqlite(alias, primary=DEFAULT_DB_ALIAS):
+    """
+    Копирует основную базу SQLite в файл реплики alias и записывает в
+    реплику время копии, по которому считается отставание.
+    """
+    source = connections[primary]
+    source.ensure_connection()
+    target = connections[alias]
+    target.close()
+    replica = sqlite3.connect(target.settings_dict['NAME'])
+    try:
+        source.connection.backup(replica)
+        replica.execute(f'CREATE TABLE IF NOT EXISTS {SYNC_TABLE} '
+                        f'(synced_at REAL NOT NULL)')
+        replica.execute(f'DELETE FROM {SYNC_TABLE}')
+        replica.execute(f'INSERT INTO {SYNC_TABLE} VALUES (?)',
+                        (time.time(),))
+        replica.commit()
+    finally:
+        replica.close()
+    with _lag_lock:
+        _lag.pop(alias, None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return replica()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+            state.replicas = False
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+    """
+    Включает чтение с реплик для безопасных запросов и закрепляет за
+    основной базой пользователя, который только что писал.
+    """
+
+    def process_request(self, request):
+        state = _State(bool(settings.DATABASE_REPLICAS)
+                       and request.method in SAFE_METHODS
+                       and not self._pinned(request))
+        request._replica_state = (state, _state.set(state))
+
+    def process_response(self, request, response):
+        state, token = request._replica_state
+        _state.reset(token)
+        wrote = state.wrote or request.method not in SAFE_METHODS
+        if settings.DATABASE_REPLICAS and wrote:
+            sticky = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(COOKIE, str(int(time.time() + sticky)),
+                                max_age=sticky, httponly=True,
+                                samesite='Lax')
+        return response
+
+    def _pinned(self, request) -> bool:
+        try:
+            return float(request.COOKIES.get(COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
@@ -0,0 +1,176 @@
+"""
+Бэкенд SQLite для нагруженного сайта.
+
+Поверх django.db.backends.sqlite3:
+- при подключении включается WAL и настраиваются PRAGMA из PRAGMAS
+  (их можно переопределить в OPTIONS['pragmas']);
+- транзакция atomic начинается с BEGIN IMMEDIATE: блокировка записи
+  берётся сразу, а не при первой записи, когда SQLite отвечает
+  "database is locked" без ожидания;
+- запись в процессе идёт через очередь WriteQueue: транзакции и
+  одиночные INSERT/UPDATE/DELETE разных потоков выполняются по одной
+  в порядке прихода, а не спорят за блокировку файла.
+
+Соединения живут в потоке между запросами, если задан CONN_MAX_AGE.
+
+    DATABASES = {
+        'default': {
+            'ENGINE': 'core.sqlite_backend',
+            'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+            'CONN_MAX_AGE': 600,
+        }
+    }
+"""
+import re
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    # В WAL NORMAL не теряет целостность, только последние транзакции
+    # при отключении питания.
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    # Отрицательное значение - в килобайтах: 64 МБ страничного кеша.
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+WRITE_RE = re.compile(r'\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)',
+                      re.IGNORECASE)
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+class WriteQueue:
+    """Писатели одной базы: пишет один поток, остальные ждут по очереди."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self._busy = False
+
+    def acquire(self, timeout) -> bool:
+        """False, если очередь не дошла за timeout секунд."""
+        with self._lock:
+            if not self._busy and not self._waiters:
+                self._busy = True
+                return True
+            ready = threading.Event()
+            self._waiters.append(ready)
+        if ready.wait(timeout):
+            return True
+        with self._lock:
+            if ready.is_set():
+                return True
+            self._waiters.remove(ready)
+            return False
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # Очередь передаётся следующему, не освобождаясь.
+                self._waiters.popleft().set()
+            else:
+                self._busy = False
+
+
+def queue_for(name) -> WriteQueue:
+    with _queues_lock:
+        return _queues.setdefault(name, WriteQueue())
+
+
+class CursorWrapper(base.SQLiteCursorWrapper):
+    def __init__(self, connection, wrapper):
+        super().__init__(connection)
+        self.wrapper = wrapper
+
+    def execute(self, query, params=None):
+        with self.wrapper.writing(query):
+            return super().execute(query, params)
+
+    def executemany(self, query, param_list):
+        with self.wrapper.writing(query):
+            return super().executemany(query, param_list)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pragmas = dict(PRAGMAS)
+        self.write_queue = None
+        self.queued = False
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **kwargs.pop('pragmas', {})}
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        self.write_queue = queue_for(conn_params['database'])
+        return connection
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(
+            factory=lambda connection: CursorWrapper(connection, self)
+        )
+
+    def _enqueue(self) -> bool:
+        if self.queued:
+            return False
+        # Дольше busy_timeout не ждём: дальше ждёт сама SQLite.
+        timeout = self.pragmas['busy_timeout'] / 1000
+        self.queued = self.write_queue.acquire(timeout)
+        return self.queued
+
+    def _dequeue(self):
+        if self.queued:
+            self.queued = False
+            self.write_queue.release()
+
+    @contextmanager
+    def writing(self, query):
+        """Одиночная запись вне транзакции ждёт своей очереди."""
+        if (self.queued or self.in_atomic_block
+                or not WRITE_RE.match(query)):
+            yield
+            return
+        entered = self._enqueue()
+        try:
+            yield
+        finally:
+            if entered:
+                self._dequeue()
+
+    def _start_transaction_under_autocommit(self):
+        self._enqueue()
+        try:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        except Exception:
+            self._dequeue()
+            raise
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self._dequeue()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self._dequeue()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self._dequeue()
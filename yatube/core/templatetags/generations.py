@@ -0,0 +1,15 @@
+from django import template
+
+from core import generations, replicas
+
+register = template.Library()
+
+
+@register.simple_tag
+def generation(scope, pk=None):
+    """
+    Текущее поколение области для ключа {% cache %}. Фрагменты,
+    собранные по реплике, хранятся отдельно: пользователь, который читает
+    основную базу после своей записи, не получит фрагмент с реплики.
+    """
+    return f'{generations.get(scope, pk)}{replicas.key_suffix()}'
@@ -0,0 +1,29 @@
+"""
+Тесты пишут в кеш и чистят его, поэтому общий файл кеша разработчика
+(core.cache_backend) на время тестов подменяется кешем в памяти.
+manage.py test получает подмену через TEST_RUNNER, pytest - через
+фикстуру в conftest.py.
+"""
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+def override_caches():
+    return override_settings(CACHES=TEST_CACHES)
+
+
+class LocMemCacheRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches = override_caches()
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        super().teardown_test_environment(**kwargs)
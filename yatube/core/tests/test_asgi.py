@@ -0,0 +1,207 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.conf import settings
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import asgi
+from core.broker import broker
+from posts import live, views
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+def request(application, path, method='GET', body=b'', headers=()):
+    """Прогоняет один HTTP-запрос через ASGI-приложение."""
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': b'',
+        'headers': list(headers),
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 5000),
+    }
+    messages = [{'type': 'http.request', 'body': body}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    status = sent[0]['status']
+    content = b''.join(message.get('body', b'') for message in sent[1:])
+    return status, dict(sent[0]['headers']), content
+
+
+@override_settings(PAGE_CACHE_ENABLED=False)
+class ASGIHandlerTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.application = asgi.ASGIHandler()
+        self.user = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        self.post = Post.objects.create(author=self.user, group=self.group,
+                                        text='Пост через ASGI')
+
+    def tearDown(self):
+        asgi.shutdown()
+
+    def test_async_views(self):
+        """Асинхронные view отдают те же страницы, что и под WSGI."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                status, headers, content = request(self.application, url)
+                self.assertEqual(status, 200)
+                self.assertIn('Пост через ASGI', content.decode())
+
+    def test_view_does_not_hold_request_thread(self):
+        """Пока асинхронная view ждёт, поток пула запросов свободен."""
+        # Оба запроса встречаются внутри view; будь поток занят до
+        # конца view, второй запрос не начался бы.
+        meeting = threading.Barrier(2, timeout=5)
+        feed_page = views._feed_page
+
+        def waiting_feed_page(*args, **kwargs):
+            meeting.wait()
+            return feed_page(*args, **kwargs)
+
+        async def both():
+            scope = {'type': 'http', 'method': 'GET',
+                     'path': reverse('posts:index'), 'headers': []}
+            sent = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                sent.append(message)
+
+            await asyncio.gather(self.application(scope, receive, send),
+                                 self.application(scope, receive, send))
+            return [message['status'] for message in sent
+                    if 'status' in message]
+
+        with mock.patch.object(asgi, 'REQUEST_THREADS', 1), \
+                mock.patch.object(views, '_feed_page', waiting_feed_page):
+            self.assertEqual(asyncio.run(both()), [200, 200])
+
+    def test_no_event_loop_outside_asgi(self):
+        """Под WSGI асинхронная view не создаёт цикл событий."""
+        with mock.patch('asyncio.events.new_event_loop',
+                        side_effect=AssertionError) as new_event_loop:
+            response = Client().get(reverse('posts:profile',
+                                            args=[self.user.username]))
+        self.assertEqual(response.status_code, 200)
+        new_event_loop.assert_not_called()
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_profiling_follows_async_view(self):
+        """Профиль запроса видит работу асинхронной view в пуле потоков."""
+        with self.assertLogs('yatube.profiling', 'INFO') as logs:
+            _, headers, _ = request(self.application, reverse('posts:index'))
+        record = json.loads(logs.output[0].split(':', 2)[2])
+        self.assertGreater(record['db'], 0)
+        self.assertGreaterEqual(record['template'], 1)
+        self.assertIn(b'db;dur=', headers[b'Server-Timing'])
+
+    def test_not_found(self):
+        status, _, _ = request(self.application,
+                               reverse('posts:group_list', args=['none']))
+        self.assertEqual(status, 404)
+
+    def test_sync_view_and_body(self):
+        """Обычные view и тело POST-запроса проходят как под WSGI."""
+        self.user.set_password('password')
+        self.user.save()
+        url = reverse('users:login')
+        _, headers, content = request(self.application, url)
+        cookie = headers[b'Set-Cookie'].split(b';')[0]
+        token = re.search(rb'name="csrfmiddlewaretoken" value="([^"]+)"',
+                          content).group(1)
+        status, headers, _ = request(
+            self.application, url, method='POST',
+            body=b'username=author&password=password&csrfmiddlewaretoken='
+            + token,
+            headers=[(b'content-type', b'application/x-www-form-urlencoded'),
+                     (b'cookie', cookie)]
+        )
+        self.assertEqual(status, 302)
+        self.assertIn(b'sessionid', headers[b'Set-Cookie'])
+
+    def test_sync_pool_is_bounded(self):
+        """Одновременно в пуле работает не больше SYNC_THREADS вызовов."""
+        running, peak = [0], [0]
+        lock = threading.Lock()
+
+        def work():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        async def many():
+            await asyncio.gather(*(asgi.sync_to_pool(work)
+                                   for _ in range(asgi.SYNC_THREADS * 3)))
+
+        asyncio.run(many())
+        self.assertEqual(peak[0], asgi.SYNC_THREADS)
+
+    def test_event_stream_until_disconnect(self):
+        """SSE идёт из цикла событий и закрывается при отключении."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        client = Client()
+        client.force_login(reader)
+        cookie = client.cookies[settings.SESSION_COOKIE_NAME].value
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': reverse('posts:follow_events'),
+            'query_string': f'after={self.post.pk - 1}'.encode(),
+            'headers': [(b'cookie', f'sessionid={cookie}'.encode())],
+        }
+        sent = []
+
+        async def run():
+            got_event = asyncio.Event()
+
+            async def receive():
+                if not sent:
+                    return {'type': 'http.request', 'body': b''}
+                await got_event.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+                if b'event: posts' in message.get('body', b''):
+                    got_event.set()
+
+            await asyncio.wait_for(self.application(scope, receive, send),
+                                   5)
+
+        asyncio.run(run())
+        self.assertEqual(sent[0]['status'], 200)
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertIn(b'data: {"new": 1}', body)
+        self.assertEqual(broker.subscribers(live.channel(self.user.pk)), 0)
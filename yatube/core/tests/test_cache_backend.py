@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from core.cache_backend import SQLiteCache
+
+
+def _incr_many(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        """Базовые операции кеша."""
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.assertIsNone(self.cache.get('missing'))
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'value'))
+        self.assertEqual(self.cache.get_many(['key', 'new', 'missing']),
+                         {'key': {'value': [1, 2]}, 'new': 'value'})
+        self.cache.delete('key')
+        self.assertFalse(self.cache.has_key('key'))
+        self.cache.set('expired', 'value', -1)
+        self.assertIsNone(self.cache.get('expired'))
+        self.assertTrue(self.cache.add('expired', 'again'))
+
+    def test_shared_between_instances(self):
+        """Ключи видны другим экземплярам, работающим с тем же файлом."""
+        other = self.make_cache()
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_incr_is_atomic_across_processes(self):
+        """incr из нескольких процессов не теряет обновлений."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=_incr_many, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_eviction_by_size(self):
+        """При переполнении вытесняются давно не читавшиеся ключи."""
+        cache = self.make_cache(MAX_SIZE=2500)
+        for num in range(3):
+            cache.set(f'key{num}', b'x' * 1000)
+            cache._connection().execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?',
+                (num, f'key{num}')
+            )
+        self.assertIsNone(cache.get('key0'))
+        cache._connection().execute(
+            "UPDATE cache SET accessed = 0 WHERE key = 'key1'"
+        )
+        cache.set('key3', b'x' * 1000)
+        self.assertIsNone(cache.get('key1'))
+        self.assertIsNotNone(cache.get('key2'))
+        stats = cache.stats()
+        self.assertEqual(stats['evictions'], 2)
+        self.assertLessEqual(stats['size'], 2500)
+        self.assertEqual(stats['entries'], 2)
+
+    def test_read_does_not_write(self):
+        """Чтение копит время доступа до ближайшей записи."""
+        cache = self.make_cache(MAX_SIZE=2500)
+        for num in range(2):
+            cache.set(f'key{num}', b'x' * 1000)
+            cache._connection().execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?',
+                (num, cache.make_key(f'key{num}'))
+            )
+        self.assertIsNotNone(cache.get('key0'))
+        accessed = cache._connection().execute(
+            'SELECT accessed FROM cache WHERE key = ?',
+            (cache.make_key('key0'),)
+        ).fetchone()[0]
+        self.assertEqual(accessed, 0)
+        cache.set('key2', b'x' * 1000)
+        self.assertIsNotNone(cache.get('key0'))
+        self.assertIsNone(cache.get('key1'))
+
+    def test_stats(self):
+        """Статистика попаданий и промахов."""
+        self.cache.set('key', 'value')
+        self.cache.get('key')
+        self.cache.get('missing')
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
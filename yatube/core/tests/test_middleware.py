@@ -0,0 +1,83 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import generations
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.user, text='Первый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:index')
+
+    def test_anonymous_page_is_cached(self):
+        """Повторный анонимный запрос отдаётся из кеша без запросов в БД."""
+        first = Client().get(self.url)
+        with CaptureQueriesContext(connection) as context:
+            second = Client().get(self.url)
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(len(context), 0)
+        self.assertEqual(first.content, second.content)
+
+    def test_matching_etag_gets_not_modified(self):
+        """Закешированная страница с тем же ETag отдаётся как 304."""
+        first = Client().get(self.url)
+        response = Client().get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertEqual(response.content, b'')
+        response = Client().get(self.url, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_write_invalidates_page(self):
+        """Запись в модели сбрасывает кеш страниц."""
+        Client().get(self.url)
+        Post.objects.create(author=self.user, text='Второй пост')
+        response = Client().get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertIn('Второй пост', response.content.decode())
+
+    def test_query_string_is_part_of_key(self):
+        """Разные query string кешируются отдельно."""
+        Client().get(self.url)
+        response = Client().get(self.url + '?page=2')
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+
+    def test_session_requests_are_not_cached(self):
+        """Запросы с сессией проходят мимо кеша."""
+        client = Client()
+        client.force_login(self.user)
+        client.get(self.url)
+        response = client.get(self.url)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_other_views_are_not_cached(self):
+        """Кешируются только перечисленные страницы."""
+        response = Client().get(reverse('users:login'))
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_stale_page_while_other_worker_renders(self):
+        """Пока страницу пересобирает другой процесс, отдаётся старая."""
+        Client().get(self.url)
+        key = f'page:{generations.get("pages")}:{self.url}'
+        expires, *entry = cache.get(key)
+        cache.set(key, (time.time() - 1, *entry))
+        cache.add(f'{key}:lock', 1)
+        response = Client().get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'stale')
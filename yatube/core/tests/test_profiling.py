@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import profiling
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1.0,
+                   PROFILING_CPROFILE_THRESHOLD=None)
+class ProfilingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.user, text='Пост для замера')
+        # Замеры кеша пишет SQLiteCache, в тестах по умолчанию LocMemCache
+        # (core.test_runner).
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.caches = override_settings(CACHES={'default': {
+            'BACKEND': 'core.cache_backend.SQLiteCache',
+            'LOCATION': os.path.join(cls.cache_dir, 'cache.sqlite3'),
+        }})
+        cls.caches.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.caches.disable()
+        shutil.rmtree(cls.cache_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:index')
+
+    def get(self):
+        with self.assertLogs('yatube.profiling', 'INFO') as logs:
+            response = Client().get(self.url)
+        return response, [json.loads(line.split(':', 2)[2])
+                          for line in logs.output]
+
+    @override_settings(PROFILING_SAMPLE_RATE=0.0)
+    def test_not_sampled(self):
+        """Вне выборки запрос не профилируется."""
+        response = Client().get(self.url)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_server_timing(self):
+        """Server-Timing с запросами к базе, кешем, шаблонами и итогом."""
+        response, _ = self.get()
+        timing = response['Server-Timing']
+        for name in ('db;dur=', 'cache;dur=', 'tpl;dur=', 'total;dur='):
+            self.assertIn(name, timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertRegex(timing, r'cache;dur=[\d.]+;desc="\d+ hit, \d+ miss"')
+
+    def test_log_line(self):
+        """Строка лога - JSON с путём, кодом и метриками."""
+        response, records = self.get()
+        record = records[0]
+        self.assertEqual(record['path'], self.url)
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['db'], 0)
+        self.assertGreater(record['cache_miss'], 0)
+        self.assertGreaterEqual(record['template'], 1)
+        self.assertGreater(record['total_ms'], record['db_ms'])
+
+    def test_cache_hits_counted(self):
+        """Повторный запрос видит попадания в кеш фрагментов."""
+        self.get()
+        _, records = self.get()
+        self.assertGreater(records[0]['cache_hit'], 0)
+
+    def test_slow_request_profile(self):
+        """Профиль cProfile сохраняется для запросов дольше порога."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with override_settings(PROFILING_CPROFILE_THRESHOLD=0,
+                               PROFILING_CPROFILE_DIR=directory):
+            _, records = self.get()
+        files = os.listdir(directory)
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].endswith('.prof'))
+        self.assertEqual(records[-1]['profile'],
+                         os.path.join(directory, files[0]))
+
+    def test_fast_request_not_dumped(self):
+        """Запрос быстрее порога профиль не оставляет."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with override_settings(PROFILING_CPROFILE_THRESHOLD=60 * 1000,
+                               PROFILING_CPROFILE_DIR=directory):
+            self.get()
+        self.assertEqual(os.listdir(directory), [])
+
+
+class TimedTest(TestCase):
+    def test_inactive_outside_request(self):
+        """Вне профилируемого запроса timed и count ничего не пишут."""
+        self.assertFalse(profiling.active())
+        with profiling.timed('db'):
+            profiling.count('cache_hit')
+
+    def test_server_timing_format(self):
+        summary = {'db_ms': 1.25, 'db': 3, 'template_ms': 2.0,
+                   'template': 1}
+        self.assertEqual(
+            profiling.server_timing(summary, 0.005),
+            'db;dur=1.2;desc="3 queries", tpl;dur=2.0;desc="1 renders", '
+            'total;dur=5.0'
+        )
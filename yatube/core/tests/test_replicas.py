@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connections, transaction
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import generations, replicas
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], PAGE_CACHE_ENABLED=False)
+class ReplicaRoutingTest(TransactionTestCase):
+    """Реплика - второй файл SQLite, который обновляет sync_sqlite."""
+
+    def setUp(self):
+        cache.clear()
+        replicas.reset()
+        self.directory = tempfile.mkdtemp()
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(self.directory, 'replica.sqlite3'),
+        }
+        connections.ensure_defaults('replica')
+        connections.prepare_test_settings('replica')
+        self.user = User.objects.create_user(username='author')
+        Post.objects.create(author=self.user, text='Пост с реплики')
+        replicas.sync_sqlite('replica')
+        # Этого поста реплика ещё не видела.
+        Post.objects.create(author=self.user, text='Свежий пост')
+
+    def tearDown(self):
+        connections['replica'].close()
+        del connections.databases['replica']
+        if hasattr(connections._connections, 'replica'):
+            del connections._connections.replica
+        replicas.reset()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def index(self, client=None):
+        response = (client or Client()).get(reverse('posts:index'))
+        return response.content.decode()
+
+    def test_reads_go_to_replica(self):
+        """GET читает реплику: поста после копии там ещё нет."""
+        content = self.index()
+        self.assertIn('Пост с реплики', content)
+        self.assertNotIn('Свежий пост', content)
+
+    def test_sticky_after_write(self):
+        """После записи пользователь какое-то время читает основную базу."""
+        self.user.set_password('password')
+        self.user.save()
+        client = Client()
+        response = client.post(reverse('users:login'),
+                               {'username': 'author', 'password': 'password'})
+        self.assertIn(replicas.COOKIE, response.cookies)
+        # Сессия доехала до реплики, срок закрепления истёк.
+        author = User.objects.create_user(username='other')
+        replicas.sync_sqlite('replica')
+        Post.objects.create(author=self.user, text='Свежий пост')
+        del client.cookies[replicas.COOKIE]
+        self.assertEqual(self.index(client).count('Свежий пост'), 1)
+        response = client.get(reverse('posts:profile_follow',
+                                      args=[author.username]))
+        self.assertIn(replicas.COOKIE, response.cookies)
+        self.assertTrue(Follow.objects.filter(user=self.user,
+                                              author=author).exists())
+        self.assertEqual(self.index(client).count('Свежий пост'), 2)
+
+    def test_expired_pin(self):
+        client = Client()
+        client.cookies[replicas.COOKIE] = str(int(time.time()) - 1)
+        self.assertNotIn('Свежий пост', self.index(client))
+
+    def test_lagging_replica_falls_back(self):
+        """Отставшая реплика не используется."""
+        with connections['replica'].cursor() as cursor:
+            cursor.execute(f'UPDATE {replicas.SYNC_TABLE} SET synced_at = %s',
+                           [time.time() - 60])
+        replicas.reset()
+        self.assertIn('Свежий пост', self.index())
+
+    def test_unavailable_replica_falls_back(self):
+        connections['replica'].close()
+        os.remove(connections['replica'].settings_dict['NAME'])
+        replicas.reset()
+        self.assertIn('Свежий пост', self.index())
+
+    def test_primary_outside_requests(self):
+        """Вне запроса и внутри транзакции чтение идёт в основную базу."""
+        self.assertEqual(Post.objects.all().db, 'default')
+        state = replicas._State(True)
+        token = replicas._state.set(state)
+        try:
+            self.assertEqual(Post.objects.all().db, 'replica')
+            with transaction.atomic():
+                self.assertEqual(Post.objects.all().db, 'default')
+            Post.objects.create(author=self.user, text='Запись')
+            self.assertEqual(Post.objects.all().db, 'default')
+        finally:
+            replicas._state.reset(token)
+
+    def test_sync_command(self):
+        Post.objects.create(author=self.user, text='Ещё пост')
+        call_command('sync_replica', stdout=open(os.devnull, 'w'))
+        self.assertEqual(Post.objects.using('replica').count(), 3)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_sync_command_without_replicas(self):
+        with self.assertRaises(CommandError):
+            call_command('sync_replica')
+
+
+class DelayedBumpTest(TransactionTestCase):
+    def test_generation_bumped_again_after_lag(self):
+        """Поколение сбрасывается ещё раз, когда реплики догонят запись."""
+        cache.clear()
+        start = generations.get('feed')
+        with override_settings(DATABASE_REPLICAS=['replica'],
+                               REPLICA_MAX_LAG=0.05):
+            generations.bump('feed')
+            self.assertEqual(generations.get('feed'), start + 1)
+            time.sleep(0.3)
+        self.assertEqual(generations.get('feed'), start + 2)
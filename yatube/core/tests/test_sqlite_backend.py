@@ -0,0 +1,108 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase
+
+from core.sqlite_backend.base import WriteQueue
+
+ALIAS = 'sqlite_backend_test'
+
+
+class SQLiteBackendTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        connections[ALIAS].close()
+        del connections.databases[ALIAS]
+        if hasattr(connections._connections, ALIAS):
+            delattr(connections._connections, ALIAS)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def connect(self, **options):
+        connections.databases[ALIAS] = {
+            'ENGINE': 'core.sqlite_backend',
+            'NAME': os.path.join(self.directory, 'db.sqlite3'),
+            'OPTIONS': options,
+        }
+        return connections[ALIAS]
+
+    def pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        """При подключении включаются WAL и настройки из PRAGMAS."""
+        connection = self.connect()
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(connection, 'synchronous'), 1)
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(connection, 'cache_size'), -64000)
+
+    def test_pragmas_from_options(self):
+        connection = self.connect(pragmas={'busy_timeout': 100})
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 100)
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+
+    def test_queue_released_after_transaction(self):
+        connection = self.connect()
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        self.assertFalse(connection.queued)
+        connection.set_autocommit(
+            False, force_begin_transaction_with_broken_autocommit=True
+        )
+        self.assertTrue(connection.queued)
+        connection.rollback()
+        connection.set_autocommit(True)
+        self.assertFalse(connection.queued)
+        self.assertFalse(connection.write_queue._busy)
+
+
+class WriteQueueTest(SimpleTestCase):
+    def test_fifo(self):
+        """Писатели получают очередь в порядке прихода."""
+        queue = WriteQueue()
+        queue.acquire(1)
+        order = []
+        threads = []
+        for num in range(5):
+            def writer(num=num):
+                queue.acquire(5)
+                order.append(num)
+                queue.release()
+            thread = threading.Thread(target=writer)
+            thread.start()
+            threads.append(thread)
+            # Следующий встаёт в очередь после предыдущего.
+            while len(queue._waiters) < num + 1:
+                pass
+        queue.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, list(range(5)))
+
+    def test_timeout(self):
+        queue = WriteQueue()
+        queue.acquire(1)
+        self.assertFalse(queue.acquire(0.01))
+        self.assertEqual(len(queue._waiters), 0)
+        queue.release()
+        self.assertTrue(queue.acquire(0.01))
+
+
+class BenchmarkWritesTest(SimpleTestCase):
+    def test_no_locked_errors(self):
+        """Под одновременной записью очередь не даёт ошибок блокировки."""
+        stdout = io.StringIO()
+        call_command('benchmark_writes', '--writers=4', '--writes=20',
+                     stdout=stdout)
+        line = stdout.getvalue().splitlines()[-1]
+        self.assertIn('core.sqlite_backend', line)
+        self.assertRegex(line, r'транзакций\s+80 "database is locked"\s+0 ')
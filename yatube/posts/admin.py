@@ -1,18 +1,70 @@
 from django.contrib import admin
-from .models import Post, Group, Comment
+from django.db.models import Count
 
+from core import generations
 
-class PostAdmin(admin.ModelAdmin):
+from .changelist import ScalableAdmin, chunked
+from .models import Post, Group, Comment, Follow
+from . import counters, search
+
+
+class PostAdmin(ScalableAdmin):
     list_display = ('pk',
                     'text',
                     'pub_date',
                     'author',
                     'group')
+    list_select_related = ('author', 'group')
+    keyset_fields = ('pub_date', 'id')
+    date_hierarchy = 'pub_date'
     search_fields = ('text',)
     list_filter = ('pub_date',)
     list_editable = ('group',)
+    raw_id_fields = ('author',)
+    actions = ('remove_from_group',)
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'group':
+            # Один запрос групп на все строки list_editable.
+            choices = getattr(request, '_group_choices', None)
+            if choices is None:
+                choices = request._group_choices = list(field.choices)
+            field.choices = choices
+        return field
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск идёт по индексу FTS5, а не LIKE по всей таблице.
+        if not search_term:
+            return queryset, False
+        found = search.search(search_term).order_by().values('pk')
+        return queryset.filter(pk__in=found), False
+
+    def remove_from_group(self, request, queryset):
+        moved = 0
+        group_ids, author_ids = set(), set()
+        for ids in chunked(queryset.filter(group__isnull=False)):
+            batch = Post.objects.filter(pk__in=ids)
+            per_group = list(
+                batch.order_by().values_list('group')
+                .annotate(total=Count('pk'))
+            )
+            author_ids.update(batch.values_list('author', flat=True))
+            moved += batch.update(group=None)
+            for group_id, total in per_group:
+                counters.change_group(group_id, -total)
+                group_ids.add(group_id)
+        generations.bump('pages')
+        generations.bump('feed')
+        for group_id in group_ids:
+            generations.bump('group', group_id)
+        for author_id in author_ids:
+            generations.bump('author', author_id)
+        self.message_user(request, f'Убрано из групп постов: {moved}')
+    remove_from_group.short_description = 'Убрать из группы'
+    remove_from_group.allowed_permissions = ('change',)
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk',
@@ -23,16 +75,55 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ScalableAdmin):
     list_display = ('pk',
                     'post',
                     'author',
                     'text',
                     'created')
+    list_select_related = ('post', 'author')
+    keyset_fields = ('created', 'id')
+    date_hierarchy = 'created'
     search_fields = ('text',)
+    raw_id_fields = ('post', 'author')
+    actions = ('delete_comments',)
+    empty_value_display = '-пусто-'
+
+    def delete_comments(self, request, queryset):
+        deleted = 0
+        post_ids = set()
+        for ids in chunked(queryset):
+            batch = Comment.objects.filter(pk__in=ids)
+            per_post = list(
+                batch.order_by().values_list('post')
+                .annotate(total=Count('pk'))
+            )
+            # Один DELETE без сигналов: то же, что comment_uncount и
+            # comment_invalidate, делается здесь раз на пачку.
+            deleted += batch._raw_delete(batch.db)
+            for post_id, total in per_post:
+                counters.change_post(post_id, -total)
+                post_ids.add(post_id)
+        generations.bump('pages')
+        for post_id in post_ids:
+            generations.bump('post', post_id)
+        self.message_user(request, f'Удалено комментариев: {deleted}')
+    delete_comments.short_description = 'Удалить пачками'
+    delete_comments.allowed_permissions = ('delete',)
+
+
+class FollowAdmin(ScalableAdmin):
+    list_display = ('pk',
+                    'user',
+                    'author')
+    list_select_related = ('user', 'author')
+    keyset_fields = ('id',)
+    search_fields = ('=user__username', '=author__username')
+    raw_id_fields = ('user', 'author')
     empty_value_display = '-пусто-'
 
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
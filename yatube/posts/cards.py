@@ -0,0 +1,65 @@
+"""
+Карточки постов в лентах.
+
+Страница карточек отрисовывается одним проходом шаблона
+posts/includes/post_cards.html, а не include на каждый пост. Ссылки
+карточек готовятся заранее через cached_reverse: на странице одни и те
+же авторы и группы встречаются много раз, а reverse каждый раз заново
+подбирает шаблон маршрута.
+"""
+from functools import lru_cache
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import get_script_prefix, get_urlconf, reverse
+
+TEMPLATE = 'posts/includes/post_cards.html'
+# Сколько разных URL помнить в процессе.
+URL_CACHE = 10000
+
+
+@lru_cache(maxsize=URL_CACHE)
+def _reverse(urlconf, prefix, name, args):
+    return reverse(name, urlconf=urlconf, args=args)
+
+
+def cached_reverse(name, *args) -> str:
+    """reverse(name, args=args), запомненный для urlconf и префикса."""
+    return _reverse(get_urlconf(), get_script_prefix(), name, args)
+
+
+@receiver(setting_changed)
+def _urlconf_changed(setting, **kwargs):
+    if setting == 'ROOT_URLCONF':
+        _reverse.cache_clear()
+
+
+def _follow(card, post, follow_set):
+    # Подписаться на себя нельзя, анонимному кнопки не нужны.
+    if follow_set is None or post.author_id == follow_set.user_id:
+        return card
+    username = post.author.username
+    card['following'] = post.author_id in follow_set
+    card['follow_url'] = cached_reverse(
+        'posts:profile_unfollow' if card['following']
+        else 'posts:profile_follow', username
+    )
+    return card
+
+
+def cards(posts, group_links=True, follow_set=None) -> list:
+    """
+    Пост и ссылки карточки для каждого поста страницы; с follow_set
+    (posts.follows) - ещё и кнопка подписки на автора.
+    """
+    return [
+        _follow({
+            'post': post,
+            'profile_url': cached_reverse('posts:profile',
+                                          post.author.username),
+            'detail_url': cached_reverse('posts:post_detail', post.pk),
+            'group_url': (cached_reverse('posts:group_list', post.group.slug)
+                          if group_links and post.group_id else None),
+        }, post, follow_set)
+        for post in posts
+    ]
@@ -0,0 +1,147 @@
+"""
+Списки админки для больших таблиц.
+
+Число строк берётся из статистики SQLite или считается с потолком,
+листание по умолчанию идёт по ключу (как в лентах сайта), а массовые
+действия обновляют записи пачками по одному запросу на пачку.
+"""
+from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+from .utils import decode_cursor, encode_cursor, keyset_after
+
+CURSOR_VAR = 'cursor'
+# Больше стольких строк точно не считаем.
+COUNT_LIMIT = 10000
+# Сколько записей обновляет один запрос массового действия.
+ACTION_CHUNK = 1000
+
+
+def estimated_rows(queryset):
+    """Число строк таблицы из sqlite_stat1 (после ANALYZE) или None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'sqlite':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    return int(row[0].split()[0]) if row else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator без точного COUNT(*) по всей таблице."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_rows(queryset)
+            if estimate is not None:
+                return estimate
+        return queryset.order_by()[:COUNT_LIMIT].count()
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Список, который при сортировке по умолчанию листается курсором:
+    страница начинается после ключа последней строки предыдущей.
+    """
+
+    def get_filters_params(self, params=None):
+        params = super().get_filters_params(params)
+        params.pop(CURSOR_VAR, None)
+        return params
+
+    def _keyset(self) -> bool:
+        return (bool(self.model_admin.keyset_fields)
+                and ORDER_VAR not in self.params
+                and not self.show_all)
+
+    def get_results(self, request):
+        self.next_url = None
+        self.keyset = self._keyset()
+        cursor = self.params.get(CURSOR_VAR)
+        if not self.keyset or not cursor:
+            super().get_results(request)
+            if self.keyset:
+                self._set_next_cursor(list(self.result_list))
+            return
+        fields = self.model_admin.keyset_fields
+        try:
+            key, number = decode_cursor(cursor, size=len(fields))
+        except ValueError:
+            super().get_results(request)
+            return
+        paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page
+        )
+        rows = keyset_after(self.queryset, fields,
+                            key)[:self.list_per_page]
+        self.result_count = paginator.count
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = True
+        self.paginator = paginator
+        self.page_num = number - 1
+        self._set_next_cursor(list(rows))
+
+    def _set_next_cursor(self, rows):
+        if len(rows) < self.list_per_page:
+            return
+        fields = self.model_admin.keyset_fields
+        cursor = encode_cursor(
+            [getattr(rows[-1], field) for field in fields],
+            self.page_num + 2
+        )
+        self.next_url = self.get_query_string({CURSOR_VAR: cursor},
+                                              [PAGE_VAR])
+
+    @property
+    def first_url(self):
+        return self.get_query_string(remove=[CURSOR_VAR, PAGE_VAR])
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """
+    ModelAdmin для таблиц на миллионы строк: связанные объекты одним
+    JOIN, оценка числа строк и листание по keyset_fields (по убыванию).
+    """
+
+    keyset_fields = ()
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_ordering(self, request):
+        if self.keyset_fields and not self.ordering:
+            return [f'-{field}' for field in self.keyset_fields]
+        return super().get_ordering(request)
+
+
+def chunked(queryset, chunk=ACTION_CHUNK):
+    """
+    id записей queryset пачками по возрастанию; каждая пачка - один
+    запрос, в памяти не больше chunk id.
+    """
+    queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        ids = list(page[:chunk])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
@@ -0,0 +1,84 @@
+"""
+Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарными UPDATE ... SET x = x + 1 из сигналов
+моделей, а recount() пересчитывает их целиком одним UPDATE на поле.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, UserCounter
+
+User = get_user_model()
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        # Не уходим в минус, если счётчик уже разошёлся с данными.
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_user(user_id, field, delta):
+    counters = UserCounter.objects.filter(user_id=user_id)
+    if _change(counters, field, delta) or delta < 0:
+        return
+    UserCounter.objects.get_or_create(user_id=user_id)
+    _change(counters, field, delta)
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        _change(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def change_post(post_id, delta):
+    _change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+# Модель, поле счётчика и выражение с его точным значением.
+COUNTERS = (
+    (UserCounter, 'posts_count', lambda: _count(Post, 'author')),
+    (UserCounter, 'followers_count', lambda: _count(Follow, 'author')),
+    (UserCounter, 'following_count', lambda: _count(Follow, 'user')),
+    (Group, 'posts_count', lambda: _count(Post, 'group')),
+    (Post, 'comments_count', lambda: _count(Comment, 'post')),
+)
+
+
+def recount(dry_run=False):
+    """
+    Пересчитывает все счётчики и возвращает число исправленных строк
+    для каждого из них.
+    """
+    # Для UserCounter OuterRef('pk') указывает на user_id.
+    fixed = {}
+    with transaction.atomic():
+        if not dry_run:
+            missing = User.objects.filter(counters__isnull=True)
+            UserCounter.objects.bulk_create(
+                (UserCounter(user_id=pk)
+                 for pk in missing.values_list('pk', flat=True).iterator()),
+                batch_size=1000,
+                ignore_conflicts=True
+            )
+        for model, field, expression in COUNTERS:
+            name = f'{model._meta.model_name}.{field}'
+            fixed[name] = model.objects.annotate(
+                expected=expression()
+            ).exclude(**{field: F('expected')}).count()
+            if fixed[name] and not dry_run:
+                model.objects.update(**{field: expression()})
+    return fixed
@@ -0,0 +1,105 @@
+"""
+Кеш подписок: множество id авторов, на которых подписан пользователь.
+
+Множество хранится в кеше отсортированным массивом целых чисел и
+читается из базы один раз; подписка и отписка после коммита удаляют
+его, и следующее чтение берёт подписки из базы. Править копию в кеше
+на месте нельзя: две одновременные подписки (две вкладки) читают одну
+копию, и одна из правок теряется. Проверка "подписан ли" - поиск
+делением пополам в памяти, поэтому кнопки подписки можно выводить сразу
+для всей страницы авторов.
+
+Кеш - только для чтения: уникальность подписки проверяет база
+(profile_follow), а если подписка уже есть, кеш сбрасывается.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow
+
+KEY_PREFIX = 'follows'
+TYPECODE = 'q'
+
+
+def _key(user_id) -> str:
+    return f'{KEY_PREFIX}:{user_id}'
+
+
+class FollowSet:
+    """Отсортированные id авторов из подписок пользователя user_id."""
+
+    __slots__ = ('user_id', 'ids')
+
+    def __init__(self, user_id, ids=()):
+        self.user_id = user_id
+        self.ids = array(TYPECODE, sorted(set(ids)))
+
+    @classmethod
+    def from_bytes(cls, user_id, data):
+        follow_set = cls(user_id)
+        follow_set.ids.frombytes(data)
+        return follow_set
+
+    def to_bytes(self) -> bytes:
+        return self.ids.tobytes()
+
+    def _index(self, author_id) -> int:
+        return bisect_left(self.ids, author_id)
+
+    def __contains__(self, author_id) -> bool:
+        index = self._index(author_id)
+        return index < len(self.ids) and self.ids[index] == author_id
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def load(user_id) -> FollowSet:
+    """Подписки из кеша, а при промахе - из базы с записью в кеш."""
+    data = cache.get(_key(user_id))
+    if data is not None:
+        return FollowSet.from_bytes(user_id, data)
+    follow_set = FollowSet(user_id, Follow.objects.filter(
+        user_id=user_id
+    ).values_list('author_id', flat=True))
+    # add, а не set: не затираем копию, которую положил другой запрос.
+    cache.add(_key(user_id), follow_set.to_bytes(),
+              settings.FOLLOWS_CACHE_TIMEOUT)
+    return follow_set
+
+
+def for_user(user):
+    """
+    Подписки пользователя, один раз на запрос; для анонимного - None.
+    """
+    if not user.is_authenticated:
+        return None
+    follow_set = getattr(user, '_follow_set', None)
+    if follow_set is None:
+        follow_set = user._follow_set = load(user.pk)
+    return follow_set
+
+
+def _forget_on_commit(user_id):
+    transaction.on_commit(lambda: forget([user_id]))
+
+
+def followed(user_id, author_id):
+    """Сбрасывает кеш подписок пользователя после коммита."""
+    _forget_on_commit(user_id)
+
+
+def unfollowed(user_id, author_id):
+    _forget_on_commit(user_id)
+
+
+def forget(user_ids):
+    """Сбрасывает кеш подписок после записи в обход сигналов."""
+    cache.delete_many([_key(user_id) for user_id in user_ids])
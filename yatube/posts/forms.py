@@ -1,12 +1,29 @@
 from django import forms
+from django.db import transaction
 from .models import Post, Comment
+from . import images, thumbnails
 from django.utils.translation import gettext_lazy as _
 
 
+class PostImageField(forms.ImageField):
+    """Картинка поста, прошедшая posts.images.ingest."""
+
+    def to_python(self, data):
+        # Проверки FileField без полного декодирования из ImageField.
+        upload = forms.FileField.to_python(self, data)
+        if upload is None:
+            return None
+        try:
+            return images.ingest(upload)
+        except images.ImageRejected as error:
+            raise forms.ValidationError(str(error), code='invalid_image')
+
+
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ['text', 'group', 'image']
+        field_classes = {'image': PostImageField}
         labels = {'text': _('Текст записи'),
                   'group': _('Группа'),
                   'image': _('Изображение')
@@ -17,6 +34,18 @@ class PostForm(forms.ModelForm):
             'image': _('Изображение поста')
         }
 
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            image = self.cleaned_data.get('image')
+            self.instance.image_placeholder = getattr(image, 'placeholder',
+                                                      '')
+        post = super().save(commit)
+        if commit and 'image' in self.changed_data and post.image:
+            # Миниатюры создаются в фоне, когда картинка уже сохранена.
+            name = post.image.name
+            transaction.on_commit(lambda: thumbnails.schedule(name))
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,129 @@
+"""
+Приём картинок постов с ограничением памяти.
+
+Загрузка лежит на диске (TemporaryFileUploadHandler), Pillow читает
+только заголовок, пока не проверены размер файла и число пикселей.
+JPEG декодируется сразу в уменьшенном масштабе (draft), поэтому память
+на одну загрузку не зависит от размера исходного файла. Сохраняется
+копия без EXIF, с применённой ориентацией и стороной не больше
+POST_IMAGE_MAX_SIDE.
+
+Заодно считается крошечная заглушка (data URI), которую страница
+показывает, пока не загрузилась сама картинка.
+"""
+import base64
+import io
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps
+
+# Форматы, которые сохраняются как есть; остальные переводятся в JPEG.
+FORMATS = {
+    'JPEG': ('.jpg', 'image/jpeg'),
+    'PNG': ('.png', 'image/png'),
+    'GIF': ('.gif', 'image/gif'),
+    'WEBP': ('.webp', 'image/webp'),
+}
+JPEG_QUALITY = 90
+# Размер заглушки в пропорциях карточки 960x339.
+PLACEHOLDER_SIZE = (24, 8)
+
+
+class ImageRejected(ValueError):
+    pass
+
+
+def _limit(name):
+    return getattr(settings, name)
+
+
+def _check_limits(upload):
+    if upload.size > _limit('POST_IMAGE_MAX_BYTES'):
+        raise ImageRejected(
+            'Файл больше %d МБ.'
+            % (_limit('POST_IMAGE_MAX_BYTES') // (1024 * 1024))
+        )
+    try:
+        image = Image.open(upload)
+    except Exception:
+        raise ImageRejected('Загрузите правильное изображение.')
+    width, height = image.size
+    if width * height > _limit('POST_IMAGE_MAX_PIXELS'):
+        raise ImageRejected('Слишком большое изображение: %dx%d.'
+                            % (width, height))
+    return image
+
+
+def _keep_original(image) -> bool:
+    # Анимацию не пересобираем, если она и так не больше лимита.
+    side = _limit('POST_IMAGE_MAX_SIDE')
+    return (getattr(image, 'is_animated', False)
+            and max(image.size) <= side)
+
+
+def _normalize(image):
+    side = _limit('POST_IMAGE_MAX_SIDE')
+    if image.format == 'JPEG':
+        # Декодирует сразу в 1/2, 1/4 или 1/8 масштаба, но не меньше side.
+        image.draft('RGB', (side, side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((side, side))
+    return image
+
+
+def placeholder(image) -> str:
+    """Заглушка картинки в виде data URI PNG на пару сотен байт."""
+    small = ImageOps.fit(image.convert('RGB'), PLACEHOLDER_SIZE)
+    buffer = io.BytesIO()
+    small.save(buffer, format='PNG', optimize=True)
+    encoded = base64.b64encode(buffer.getvalue()).decode('ascii')
+    return f'data:image/png;base64,{encoded}'
+
+
+def placeholder_for(file) -> str:
+    """Заглушка уже сохранённой картинки; JPEG декодируется в 1/8."""
+    with Image.open(file) as image:
+        image.draft('RGB', PLACEHOLDER_SIZE)
+        return placeholder(image)
+
+
+def ingest(upload):
+    """
+    Проверяет загрузку и возвращает нормализованную копию картинки
+    во временном файле на диске; заглушка лежит в атрибуте placeholder.
+    """
+    upload.seek(0)
+    image = _check_limits(upload)
+    source_format = image.format
+    name, extension = os.path.splitext(os.path.basename(upload.name))
+    if source_format in FORMATS and _keep_original(image):
+        upload.content_type = FORMATS[source_format][1]
+        upload.placeholder = placeholder(image)
+        upload.seek(0)
+        return upload
+    try:
+        image = _normalize(image)
+    except Exception:
+        raise ImageRejected('Загрузите правильное изображение.')
+
+    target = source_format if source_format in FORMATS else 'JPEG'
+    if target == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    new_extension, content_type = FORMATS[target]
+    if source_format != target:
+        extension = new_extension
+    options = {'quality': JPEG_QUALITY, 'optimize': True}
+    if target != 'JPEG':
+        options = {}
+    # Безымянный файл удаляется сам, хранилище копирует его по частям.
+    output = tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR)
+    # Метаданные (EXIF, ICC и т.п.) при сохранении не переносятся.
+    image.save(output, format=target, **options)
+    size = output.tell()
+    output.seek(0)
+    result = UploadedFile(output, f'{name}{extension}', content_type, size)
+    result.placeholder = placeholder(image)
+    return result
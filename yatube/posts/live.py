@@ -0,0 +1,86 @@
+"""
+Уведомления о новых постах ленты подписок (server-sent events).
+
+Новый пост после коммита публикуется в канал автора брокера
+core.broker, а подписчик слушает каналы авторов, на которых подписан.
+Под ASGI соединение висит долго и не занимает поток, и страница ленты
+подключает EventSource только там. Под WSGI ожидание держало бы
+воркер, поэтому ответ сразу отдаёт пропущенные посты и просит
+переподключиться не раньше чем через POLL_RETRY.
+"""
+import json
+
+from django.db import transaction
+
+from core.broker import broker
+
+from .models import Post
+
+CONTENT_TYPE = 'text/event-stream'
+# Комментарий-пинг, чтобы прокси не закрывали тихое соединение.
+HEARTBEAT = 15
+# Через сколько миллисекунд браузер переподключается.
+RETRY = 1000
+POLL_RETRY = 10 * 60 * 1000
+# Больше стольких пропущенных постов при переподключении не считаем.
+MISSED_LIMIT = 100
+
+
+def channel(author_id) -> str:
+    return f'author:{author_id}'
+
+
+def publish(post):
+    """Сообщает подписчикам автора о посте, когда он виден в базе."""
+    transaction.on_commit(
+        lambda: broker.publish(channel(post.author_id), post.pk)
+    )
+
+
+def subscribe(author_ids, loop=None):
+    return broker.subscribe([channel(pk) for pk in author_ids], loop=loop)
+
+
+def missed(author_ids, last_id) -> list:
+    """id постов, вышедших после last_id, пока клиент был отключён."""
+    try:
+        last_id = int(last_id)
+    except (TypeError, ValueError):
+        return []
+    return list(
+        Post.objects.filter(pk__gt=last_id, author__in=author_ids)
+        .order_by('pk').values_list('pk', flat=True)[:MISSED_LIMIT]
+    )
+
+
+class EventStream:
+    """События 'posts' c числом новых постов; id события - id поста."""
+
+    def __init__(self, subscription, missed=(), last_id=None):
+        self.subscription = subscription
+        self.pending = list(missed)
+        try:
+            self.last_id = int(last_id)
+        except (TypeError, ValueError):
+            self.last_id = 0
+
+    def event(self, post_ids) -> str:
+        # Пост мог прийти и из missed, и от брокера - считаем один раз.
+        fresh = [pk for pk in post_ids if pk > self.last_id]
+        if not fresh:
+            return ''
+        self.last_id = max(fresh)
+        data = json.dumps({'new': len(fresh)})
+        return f'id: {self.last_id}\nevent: posts\ndata: {data}\n\n'
+
+    async def stream(self):
+        """Бесконечный поток для ASGI."""
+        yield f'retry: {RETRY}\n\n'
+        posts = self.pending
+        while True:
+            yield self.event(posts) or ': ping\n\n'
+            posts = await self.subscription.wait_async(HEARTBEAT)
+
+    def once(self) -> str:
+        """Пропущенные посты без ожидания - для WSGI."""
+        return f'retry: {POLL_RETRY}\n\n' + self.event(self.pending)
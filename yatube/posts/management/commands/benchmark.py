@@ -0,0 +1,339 @@
+import io
+import json
+import math
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from importlib import import_module
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.template.backends.django import Template
+from django.test import Client, override_settings
+from django.urls import reverse
+from faker import Faker
+from mixer.backend.django import mixer
+from PIL import Image
+
+from posts import counters, images, search, thumbnails, timeline
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+URLCONFS = ('posts.urls', 'users.urls', 'about.urls')
+# Query string для маршрутов, которым без неё нечего делать.
+QUERIES = {
+    'posts:search': lambda sample: {'q': sample['word']},
+    # С after ответ отдаёт пропущенные посты, а не одну строку retry.
+    'posts:follow_events': lambda sample: {'after': 0},
+}
+# После этих маршрутов клиент разлогинен - входим перед каждым замером.
+RELOGIN = ('users:logout',)
+BATCH = 500
+SEED = 2022
+PERCENTILES = (50, 95, 99)
+# Доля постов с картинкой и сколько авторов читает пользователь замеров.
+IMAGE_SHARE = 0.3
+READER_FOLLOWS = 20
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def _images(count, fake):
+    """Сохраняет count картинок; имя файла -> заглушка."""
+    placeholders = {}
+    for num in range(count):
+        image = Image.new('RGB', (1200, 800), fake.hex_color())
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=85)
+        name = default_storage.save(f'posts/bench-{num}.jpg',
+                                    ContentFile(buffer.getvalue()))
+        thumbnails.generate(name)
+        with default_storage.open(name) as file:
+            placeholders[name] = images.placeholder_for(file)
+    return placeholders
+
+
+def _bulk(model, objects):
+    for start in range(0, len(objects), BATCH):
+        model.objects.bulk_create(objects[start:start + BATCH])
+
+
+def seed(sizes) -> dict:
+    """
+    Наполняет базу и возвращает образцы для URL. Пользователи и группы
+    создаются mixer, массовые записи - bulk_create с текстами Faker,
+    после чего пересчитываются счётчики, ленты и поисковый индекс.
+    """
+    fake = Faker('ru_RU')
+    fake.seed_instance(SEED)
+    rnd = random.Random(SEED)
+    users = mixer.cycle(max(sizes['users'], 2)).blend(
+        User, username=mixer.sequence('bench{0}')
+    )
+    groups = mixer.cycle(max(sizes['groups'], 1)).blend(
+        Group, slug=mixer.sequence('bench-{0}')
+    )
+    placeholders = _images(sizes['images'], fake)
+    names = list(placeholders)
+
+    posts = []
+    for _ in range(sizes['posts']):
+        name = ''
+        if names and rnd.random() < IMAGE_SHARE:
+            name = rnd.choice(names)
+        posts.append(Post(author=rnd.choice(users),
+                          group=rnd.choice(groups + [None]),
+                          text=fake.paragraph(nb_sentences=4),
+                          image=name,
+                          image_placeholder=placeholders.get(name, '')))
+    _bulk(Post, posts)
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+
+    _bulk(Comment, [
+        Comment(post_id=rnd.choice(post_ids), author=rnd.choice(users),
+                text=fake.sentence())
+        for _ in range(sizes['comments'] if post_ids else 0)
+    ])
+
+    reader = users[0]
+    pairs = {(reader.pk, author.pk)
+             for author in users[1:READER_FOLLOWS + 1]}
+    # Повторы пар отбрасываются, поэтому попыток с запасом.
+    for _ in range(sizes['follows'] * 3):
+        if len(pairs) >= sizes['follows']:
+            break
+        user, author = rnd.sample(users, 2)
+        pairs.add((user.pk, author.pk))
+    _bulk(Follow, [Follow(user_id=user_id, author_id=author_id)
+                   for user_id, author_id in sorted(pairs)])
+
+    counters.recount()
+    for user_id in {user_id for user_id, _ in pairs}:
+        timeline.rebuild(user_id)
+    if search.available():
+        search.rebuild()
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    # Пост читателя, чтобы и правка открывалась, а не перенаправляла.
+    posts = Post.objects.order_by('-comments_count')
+    post = posts.filter(author=reader).first() or posts.first()
+    return {
+        'reader': reader,
+        'slug': groups[0].slug,
+        'username': users[1].username,
+        'post_id': post.pk if post else 0,
+        'word': post.text.split()[0] if post else 'пост',
+    }
+
+
+def routes(sample):
+    """(имя, url) каждого маршрута из URLCONFS."""
+    for module in URLCONFS:
+        urls = import_module(module)
+        for pattern in urls.urlpatterns:
+            name = f'{urls.app_name}:{pattern.name}'
+            kwargs = {key: sample[key]
+                      for key in pattern.pattern.converters}
+            url = reverse(name, kwargs=kwargs)
+            query = QUERIES.get(name)
+            if query:
+                url = f'{url}?{urlencode(query(sample))}'
+            yield name, url
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу данными заданного размера и замеряет каждый '
+            'маршрут posts, users и about тестовым клиентом.')
+
+    def add_arguments(self, parser):
+        for name, default in (('users', 50), ('groups', 5),
+                              ('posts', 2000), ('comments', 5000),
+                              ('follows', 500), ('images', 5)):
+            parser.add_argument(f'--{name}', type=int, default=default,
+                                help=f'Сколько создать ({default}).')
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Замеров на маршрут.')
+        parser.add_argument('--warmup', type=int, default=2,
+                            help='Незамеряемых запросов перед замерами.')
+        parser.add_argument('--anonymous', action='store_true',
+                            help='Ходить без входа на сайт.')
+        parser.add_argument('--cache', action='store_true',
+                            help='Включить кеши страниц и фрагментов '
+                                 '(в памяти процесса).')
+        parser.add_argument('--output', help='Записать результаты в JSON.')
+        parser.add_argument('--compare',
+                            help='JSON прошлого запуска для сравнения.')
+        parser.add_argument('--in-place', action='store_true',
+                            help='Работать в текущей базе, а не во '
+                                 'временной (данные останутся).')
+
+    def handle(self, *args, **options):
+        sizes = {name: options[name] for name in
+                 ('users', 'groups', 'posts', 'comments', 'follows',
+                  'images')}
+        media_root = tempfile.mkdtemp(prefix='benchmark-')
+        cache_backend = ('django.core.cache.backends.locmem.LocMemCache'
+                         if options['cache'] else
+                         'django.core.cache.backends.dummy.DummyCache')
+        old_name = None
+        if not options['in_place']:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0,
+                                               autoclobber=True,
+                                               serialize=False)
+        try:
+            with override_settings(
+                MEDIA_ROOT=media_root,
+                CACHES={'default': {'BACKEND': cache_backend}},
+                PAGE_CACHE_ENABLED=options['cache'],
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            ):
+                started = time.perf_counter()
+                sample = seed(sizes)
+                self.stdout.write(
+                    f'База наполнена за {time.perf_counter() - started:.1f} с'
+                )
+                results = self.run_routes(sample, options)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        self.report(results)
+        report = {
+            'sizes': sizes,
+            'iterations': options['iterations'],
+            'anonymous': options['anonymous'],
+            'cache': options['cache'],
+            'routes': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2,
+                          sort_keys=True)
+        if options['compare']:
+            self.compare(report, options['compare'])
+
+    def client(self, sample, options):
+        client = Client()
+        if not options['anonymous']:
+            client.force_login(sample['reader'])
+        return client
+
+    def measure(self, client, url):
+        """Один запрос в откатываемой транзакции: время, запросы, шаблоны."""
+        rendering = []
+        render = Template.render
+
+        def timed_render(template, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return render(template, *args, **kwargs)
+            finally:
+                rendering.append(time.perf_counter() - started)
+
+        queries = []
+
+        def timed_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append(time.perf_counter() - started)
+
+        with mock.patch.object(Template, 'render', timed_render), \
+                connection.execute_wrapper(timed_query), \
+                transaction.atomic():
+            started = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return {
+            'status': response.status_code,
+            'time': elapsed,
+            'queries': len(queries),
+            'query_time': sum(queries),
+            'render_time': sum(rendering),
+        }
+
+    def run_routes(self, sample, options) -> dict:
+        if options['iterations'] < 1:
+            raise CommandError('Нужен хотя бы один замер.')
+        results = {}
+        for name, url in routes(sample):
+            client = self.client(sample, options)
+            runs = []
+            for num in range(options['warmup'] + options['iterations']):
+                if name in RELOGIN and not options['anonymous']:
+                    client.force_login(sample['reader'])
+                run = self.measure(client, url)
+                if num >= options['warmup']:
+                    runs.append(run)
+            times = [run['time'] * 1000 for run in runs]
+            results[name] = {
+                'url': url,
+                'status': runs[-1]['status'],
+                **{f'p{percent}_ms': round(percentile(times, percent), 3)
+                   for percent in PERCENTILES},
+                'queries': statistics.median(run['queries'] for run in runs),
+                'query_ms': round(statistics.median(
+                    run['query_time'] * 1000 for run in runs), 3),
+                'render_ms': round(statistics.median(
+                    run['render_time'] * 1000 for run in runs), 3),
+            }
+        return results
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"маршрут":<28} {"код":>4} {"p50":>8} {"p95":>8} {"p99":>8} '
+            f'{"SQL":>4} {"SQL мс":>8} {"шаблон":>8}'
+        )
+        for name, row in results.items():
+            self.stdout.write(
+                f'{name:<28} {row["status"]:>4} {row["p50_ms"]:>8.2f} '
+                f'{row["p95_ms"]:>8.2f} {row["p99_ms"]:>8.2f} '
+                f'{row["queries"]:>4g} {row["query_ms"]:>8.2f} '
+                f'{row["render_ms"]:>8.2f}'
+            )
+
+    def compare(self, report, path):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline.get('sizes') != report['sizes']:
+            self.stdout.write(self.style.WARNING(
+                'Размеры базы отличаются от сравниваемого запуска.'
+            ))
+        self.stdout.write(f'Сравнение с {path} (p50, запросы):')
+        for name, row in report['routes'].items():
+            old = baseline['routes'].get(name)
+            if old is None:
+                self.stdout.write(f'{name:<28} новый маршрут')
+                continue
+            change = (row['p50_ms'] / old['p50_ms'] - 1) * 100 \
+                if old['p50_ms'] else 0
+            line = (f'{name:<28} {old["p50_ms"]:>8.2f} -> '
+                    f'{row["p50_ms"]:>8.2f} мс ({change:+.0f}%), '
+                    f'запросов {old["queries"]:g} -> {row["queries"]:g}')
+            style = (self.style.ERROR if change > 10
+                     or row['queries'] > old['queries']
+                     else self.style.SUCCESS if change < -10
+                     else str)
+            self.stdout.write(style(line))
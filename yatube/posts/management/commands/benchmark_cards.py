@@ -0,0 +1,113 @@
+import statistics
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.template import Context, Engine
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+# Лента до posts.cards: include карточки и {% url %} на каждый пост.
+LEGACY = {
+    'legacy/post_list.html': """<article>
+  <ul>
+    <li>
+      Автор: {{ post.author.get_full_name }}
+      <a href="{% url 'posts:profile' post.author %}">
+        все посты пользователя</a>
+    </li>
+    <li>
+      Дата публикации: {{ post.pub_date|date:"d E Y" }}
+    </li>
+  </ul>
+  {% if post.picture %}
+    {% include 'posts/includes/picture.html' with picture=post.picture %}
+  {% endif %}
+  <p>{{ post.text }}</p>
+  <a href="{% url 'posts:post_detail' post.pk %}">подробная информация </a>
+</article>""",
+    'legacy/page.html': """{% for post in page_obj %}
+    {% include 'legacy/post_list.html' %}
+      {% if post.group %}
+        <a href="{% url 'posts:group_list' post.group.slug %}">
+          все записи группы</a>
+      {% endif %}
+    {% if not forloop.last %}<hr>{% endif %}
+  {% endfor %}""",
+    'cards/page.html': '{% load post_cards %}{% post_cards page_obj %}',
+}
+
+
+def engine() -> Engine:
+    """Движок с кешем скомпилированных шаблонов, как в продакшене."""
+    return Engine(
+        dirs=[settings.TEMPLATES_DIR],
+        app_dirs=False,
+        libraries={'post_cards': 'posts.templatetags.post_cards'},
+        loaders=[('django.template.loaders.cached.Loader', [
+            ('django.template.loaders.locmem.Loader', LEGACY),
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ])],
+    )
+
+
+def page(size) -> list:
+    """Посты страницы в памяти: десять авторов и три группы."""
+    authors = [User(pk=num, username=f'author{num}', first_name='Имя',
+                    last_name=f'Фамилия{num}') for num in range(1, 11)]
+    groups = [Group(pk=num, slug=f'group-{num}', title=f'Группа {num}')
+              for num in range(1, 4)]
+    posts = []
+    for num in range(1, size + 1):
+        group = groups[num % 4 - 1] if num % 4 else None
+        post = Post(pk=num, author=authors[num % len(authors)], group=group,
+                    text=f'Текст поста {num}. ' * 10,
+                    pub_date=datetime(2022, 1, 1))
+        post.picture = None
+        posts.append(post)
+    return posts
+
+
+class Command(BaseCommand):
+    help = ('Замеряет отрисовку страницы карточек постов: include на '
+            'каждую карточку против одного прохода {% post_cards %}.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=10,
+                            help='Карточек на странице.')
+        parser.add_argument('--iterations', type=int, default=500,
+                            help='Отрисовок страницы на замер.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Замеров; берётся медиана.')
+
+    def handle(self, *args, **options):
+        if min(options['cards'], options['iterations'],
+               options['repeat']) < 1:
+            raise CommandError('Нужны хотя бы одна карточка и один замер.')
+        templates = engine()
+        context = {'page_obj': page(options['cards'])}
+        results = {}
+        for name in ('legacy/page.html', 'cards/page.html'):
+            template = templates.get_template(name)
+            # Прогрев: компиляция и кеши reverse.
+            template.render(Context(context))
+            runs = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                for _ in range(options['iterations']):
+                    template.render(Context(context))
+                runs.append(time.perf_counter() - started)
+            results[name] = (statistics.median(runs) * 1e6
+                             / options['iterations'] / options['cards'])
+        before = results['legacy/page.html']
+        after = results['cards/page.html']
+        self.stdout.write(f'include и {{% url %}}: {before:8.1f} мкс '
+                          f'на карточку')
+        self.stdout.write(f'{{% post_cards %}}:   {after:8.1f} мкс '
+                          f'на карточку')
+        self.stdout.write(f'Быстрее в {before / after:.2f} раза')
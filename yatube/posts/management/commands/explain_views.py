@@ -0,0 +1,119 @@
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from posts.models import Follow, Group, Post, UserCounter
+
+# Признаки плохого плана в выводе EXPLAIN QUERY PLAN.
+FULL_SCAN = 'SCAN '
+TEMP_SORT = 'USE TEMP B-TREE'
+FULL_TEXT = 'VIRTUAL TABLE'
+# Таблицы, которые всегда малы и читаются целиком.
+SMALL_TABLES = ('django_site', 'django_content_type')
+
+
+def _targets():
+    """(имя, url, пользователь) для каждой view на реальных данных."""
+    targets = [('index', reverse('posts:index'), None)]
+    group = Group.objects.order_by('-posts_count').first()
+    if group:
+        targets.append(('group_list',
+                        reverse('posts:group_list', args=[group.slug]),
+                        None))
+    counter = UserCounter.objects.select_related('user').order_by(
+        '-posts_count'
+    ).first()
+    if counter:
+        targets.append(('profile',
+                        reverse('posts:profile',
+                                args=[counter.user.username]),
+                        None))
+    post = Post.objects.order_by('-comments_count').first()
+    if post:
+        targets.append(('post_detail',
+                        reverse('posts:post_detail', args=[post.pk]),
+                        None))
+        word = next(iter(post.text.split()), '')
+        if word:
+            targets.append(('search',
+                            reverse('posts:search') + '?'
+                            + urlencode({'q': word}), None))
+    follow = Follow.objects.select_related('user').first()
+    if follow:
+        targets.append(('follow_index', reverse('posts:follow_index'),
+                        follow.user))
+    return targets
+
+
+def _problems(plan):
+    problems = []
+    # Выдачу поиска неизбежно сортируют по релевантности.
+    ranked = any(FULL_TEXT in detail for detail in plan)
+    for detail in plan:
+        scan = (detail.startswith(FULL_SCAN)
+                and ' USING ' not in detail
+                and FULL_TEXT not in detail
+                and not any(table in detail for table in SMALL_TABLES))
+        if scan:
+            problems.append(f'полный просмотр: {detail}')
+        if TEMP_SORT in detail and not ranked:
+            problems.append(f'сортировка во временном B-дереве: {detail}')
+    return problems
+
+
+class Command(BaseCommand):
+    help = ('Показывает EXPLAIN QUERY PLAN запросов страниц постов и '
+            'отмечает полные просмотры таблиц и сортировки без индекса.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Печатать планы всех запросов.')
+
+    def run_view(self, url, user):
+        request = RequestFactory().get(url)
+        request.user = user or AnonymousUser()
+        match = resolve(request.path_info)
+        queries = []
+
+        def capture(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        # Страница строится в транзакции, которая затем откатывается.
+        with transaction.atomic():
+            with connection.execute_wrapper(capture):
+                match.func(request, *match.args, **match.kwargs)
+            transaction.set_rollback(True)
+        return [(sql, params) for sql, params in queries
+                if sql.lstrip().upper().startswith('SELECT')]
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN есть только у SQLite.')
+        flagged = 0
+        for name, url, user in _targets():
+            queries = self.run_view(url, user)
+            self.stdout.write(f'{name} ({url}): запросов {len(queries)}')
+            for sql, params in queries:
+                plan = self.explain(sql, params)
+                problems = _problems(plan)
+                if not problems and not options['verbose_plans']:
+                    continue
+                self.stdout.write(f'  {sql[:200]}')
+                for detail in plan:
+                    self.stdout.write(f'    {detail}')
+                for problem in problems:
+                    self.stdout.write(self.style.WARNING(f'    ! {problem}'))
+                flagged += bool(problems)
+        if flagged:
+            raise CommandError(f'Запросов с плохим планом: {flagged}')
+        self.stdout.write(self.style.SUCCESS('Плохих планов не найдено.'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, пользователей, посты, комментарии и '
+            'подписки в NDJSON (.gz - со сжатием), не держа их в памяти.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-',
+                            help='Файл; по умолчанию stdout.')
+        parser.add_argument('--chunk', type=int, default=transfer.CHUNK,
+                            help='Сколько строк читать из базы за раз.')
+
+    def handle(self, *args, **options):
+        with transfer.open_stream(options['output'], 'w') as stream:
+            totals = transfer.export(stream, chunk=options['chunk'])
+        for name, count in totals.items():
+            self.stderr.write(f'{name}: {count}')
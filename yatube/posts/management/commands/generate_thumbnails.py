@@ -0,0 +1,59 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import images, thumbnails
+from posts.models import Post
+
+
+def _fill_placeholder(name):
+    posts = Post.objects.filter(image=name, image_placeholder='')
+    if posts.exists():
+        with default_storage.open(name) as file:
+            posts.update(image_placeholder=images.placeholder_for(file))
+
+
+def _generate(names):
+    # Ошибки возвращаются родителю: вывод команды есть только у него.
+    done, errors = 0, []
+    for name in names:
+        try:
+            thumbnails.generate(name)
+            _fill_placeholder(name)
+            done += 1
+        except Exception as error:
+            errors.append(f'{name}: {error}')
+    connections.close_all()
+    return done, errors
+
+
+class Command(BaseCommand):
+    help = ('Создаёт миниатюры и заглушки для уже загруженных '
+            'картинок постов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Число процессов; по умолчанию по ядрам.')
+        parser.add_argument('--chunk', type=int, default=50,
+                            help='Сколько картинок отдавать процессу за раз.')
+
+    def handle(self, *args, **options):
+        names = list(
+            Post.objects.exclude(image='')
+            .order_by().values_list('image', flat=True).distinct()
+        )
+        chunk = options['chunk']
+        chunks = [names[i:i + chunk] for i in range(0, len(names), chunk)]
+        # Дочерние процессы открывают собственные соединения с базой.
+        connections.close_all()
+        done = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for count, errors in pool.map(_generate, chunks):
+                for error in errors:
+                    self.stderr.write(error)
+                done += count
+                self.stdout.write(f'Готово {done} из {len(names)}')
+        self.stdout.write(self.style.SUCCESS(f'Миниатюр создано: {done}'))
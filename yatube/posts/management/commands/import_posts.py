@@ -0,0 +1,31 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Загружает NDJSON из export_posts пачками bulk_create и '
+            'пересобирает счётчики, ленты, поиск и миниатюры.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default='-',
+                            help='Файл (.gz - сжатый); по умолчанию stdin.')
+        parser.add_argument('--chunk', type=int, default=transfer.CHUNK,
+                            help='Сколько объектов записывать за раз.')
+        parser.add_argument('--skip-thumbnails', action='store_true',
+                            help='Не создавать миниатюры картинок.')
+
+    def handle(self, *args, **options):
+        importer = transfer.Importer(chunk=options['chunk'])
+        try:
+            with transfer.open_stream(options['input'], 'r') as stream:
+                totals = importer.load(stream)
+        except (OSError, ValueError, IntegrityError) as error:
+            raise CommandError(f'Загрузка прервана: {error}')
+        for name, count in totals.items():
+            self.stdout.write(f'{name}: {count}')
+        if importer.has_images and not options['skip_thumbnails']:
+            # Файлы картинок переносятся отдельно, вместе с media.
+            call_command('generate_thumbnails', stdout=self.stdout)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковый индекс постов.'
+
+    def handle(self, *args, **options):
+        if not search.available():
+            self.stdout.write('Поисковый индекс есть только у SQLite.')
+            return
+        done = search.rebuild()
+        self.stdout.write(f'Проиндексировано постов: {done}')
@@ -1,26 +1,68 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 
 User = get_user_model()
 TEST_EXAMPLE_STR = 15
 
 
-class Group(models.Model):
+class CounterFieldsMixin:
+    """
+    Поля counter_fields меняют только UPDATE ... F() из posts.counters.
+    Обычный save() существующей строки (форма, админка) их не пишет,
+    иначе значения из памяти затёрли бы параллельные прибавления.
+    """
+
+    counter_fields = ()
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if not self._state.adding and not force_insert:
+            if update_fields is None:
+                update_fields = [field.name
+                                 for field in self._meta.concrete_fields
+                                 if not field.primary_key]
+            update_fields = [name for name in update_fields
+                             if name not in self.counter_fields]
+        super().save(force_insert, force_update, using, update_fields)
+
+
+class Group(CounterFieldsMixin, models.Model):
     title = models.CharField(max_length=200,
                              verbose_name="Название группы")
     slug = models.SlugField(max_length=50,
                             unique=True,
                             verbose_name="Ссылка группы")
     description = models.TextField(verbose_name="Описание группы")
+    posts_count = models.PositiveIntegerField(default=0,
+                                              editable=False,
+                                              verbose_name="Число постов")
+
+    counter_fields = ('posts_count',)
 
     def __str__(self) -> str:
         return self.title
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты вместе с автором и группой, которые выводит карточка."""
+        return self.select_related('author', 'group')
+
+    def for_detail(self):
+        """
+        Пост со счётчиками автора; комментарии читаются отдельно
+        порциями (posts.views.comments_page).
+        """
+        return self.for_feed().select_related('author__counters')
+
+
+class Post(CounterFieldsMixin, models.Model):
     text = models.TextField(verbose_name="Текст поста")
-    pub_date = models.DateTimeField(auto_now_add=True,
+    # default, а не auto_now_add: загрузка (posts.transfer) пишет даты
+    # из файла.
+    pub_date = models.DateTimeField(default=timezone.now, editable=False,
                                     verbose_name="Дата публикации")
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
@@ -38,15 +80,42 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    image_placeholder = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name="Заглушка картинки"
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Число комментариев"
+    )
+
+    objects = PostQuerySet.as_manager()
+    counter_fields = ('comments_count',)
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ленты листаются по (pub_date, id) в порядке убывания.
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_date_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:TEST_EXAMPLE_STR]
 
+    def save(self, *args, **kwargs):
+        # Счётчики обновляются в сигналах внутри этой же транзакции.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post,
@@ -60,7 +129,7 @@ class Comment(models.Model):
                                verbose_name="Автор"
                                )
     text = models.TextField(verbose_name="Текст комментария")
-    created = models.DateTimeField(auto_now_add=True,
+    created = models.DateTimeField(default=timezone.now, editable=False,
                                    verbose_name="Дата публикации"
                                    )
 
@@ -68,10 +137,20 @@ class Comment(models.Model):
         ordering = ['-created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+            models.Index(fields=['-created', '-id'],
+                         name='comment_created_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:TEST_EXAMPLE_STR]
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User,
@@ -92,3 +171,109 @@ class Follow(models.Model):
                 fields=['user', 'author'],
                 name='unique appversion')
         ]
+        # (user, author) покрывает уникальный индекс выше.
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class UserCounter(models.Model):
+    """Хранимые счётчики пользователя, чтобы не считать COUNT(*)."""
+
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='counters',
+                                verbose_name='Пользователь')
+    posts_count = models.PositiveIntegerField(default=0,
+                                              verbose_name='Число постов')
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписок'
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    @classmethod
+    def for_user(cls, user):
+        """Счётчики пользователя; нули, если он ещё ничего не делал."""
+        try:
+            return user.counters
+        except cls.DoesNotExist:
+            return cls(user=user)
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписчика."""
+
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='timeline',
+                             verbose_name='Подписчик')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline',
+                             verbose_name='Пост')
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='+',
+                               verbose_name='Автор')
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique timeline post')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+
+class SearchStemsField(models.TextField):
+    """Колонка таблицы FTS5, для которой есть lookup match."""
+
+
+@SearchStemsField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class PostSearch(models.Model):
+    """
+    Строка поискового индекса FTS5. Таблицу создаёт и заполняет
+    posts.search, rowid совпадает с id поста.
+    """
+
+    post = models.OneToOneField(Post,
+                                on_delete=models.DO_NOTHING,
+                                primary_key=True,
+                                db_column='rowid',
+                                related_name='search_entry')
+    stems = SearchStemsField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_search'
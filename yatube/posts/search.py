@@ -0,0 +1,125 @@
+"""
+Полнотекстовый поиск по постам.
+
+Индекс - виртуальная таблица SQLite FTS5, в которую пишутся основы
+слов текста поста (posts.stemmer). Таблица создаётся после migrate,
+строки обновляются сигналами при создании, правке и удалении поста.
+Результаты сортируются по релевантности bm25.
+"""
+import re
+
+from django.db import connection, connections
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import Post, PostSearch
+from .stemmer import stem
+
+TABLE = PostSearch._meta.db_table
+# Сколько постов переиндексировать за один INSERT.
+REBUILD_CHUNK = 500
+
+WORD_RE = re.compile(r'\w+')
+
+
+def available(using='default') -> bool:
+    return connections[using].vendor == 'sqlite'
+
+
+def stems(text: str) -> str:
+    return ' '.join(stem(word) for word in WORD_RE.findall(text))
+
+
+def create_table(using='default'):
+    if not available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5('
+            f"stems, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+
+def index(post):
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, stems) VALUES (%s, %s)',
+            [post.pk, stems(post.text)]
+        )
+
+
+def unindex(post_id):
+    if not available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def index_many(rows, cursor=None):
+    """Индексирует новые посты по парам (id, текст) одним INSERT."""
+    if not available():
+        return
+    if cursor is None:
+        with connection.cursor() as cursor:
+            return index_many(rows, cursor)
+    cursor.executemany(
+        f'INSERT INTO {TABLE} (rowid, stems) VALUES (%s, %s)',
+        [(pk, stems(text)) for pk, text in rows]
+    )
+
+
+def rebuild() -> int:
+    """Переиндексирует все посты; возвращает их число."""
+    create_table()
+    done = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        rows = Post.objects.order_by().values_list('pk', 'text').iterator(
+            chunk_size=REBUILD_CHUNK
+        )
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == REBUILD_CHUNK:
+                index_many(batch, cursor)
+                done += len(batch)
+                batch = []
+        if batch:
+            index_many(batch, cursor)
+            done += len(batch)
+    return done
+
+
+def match_expression(query: str):
+    """Запрос FTS5: все основы слов запроса, каждая как префикс."""
+    words = stems(query).split()
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _ranked(queryset, score: str):
+    return queryset.annotate(
+        score=RawSQL(score, (), output_field=FloatField())
+    ).order_by('-score', '-id')
+
+
+def search(query: str):
+    """
+    Посты, подходящие под запрос, с релевантностью score: чем больше,
+    тем выше пост в выдаче. Пустая выдача тоже несёт score, по нему
+    листает пагинация.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return _ranked(Post.objects.none(), '0.0')
+    if not available():
+        return _ranked(Post.objects.filter(text__icontains=query), '0.0')
+    # bm25 тем меньше, чем пост релевантнее, поэтому знак меняется.
+    return _ranked(
+        Post.objects.filter(search_entry__stems__match=expression),
+        f'-bm25({TABLE})'
+    )
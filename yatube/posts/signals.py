@@ -0,0 +1,166 @@
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from core import generations
+
+from . import counters, follows, live, search, timeline
+from .models import Comment, Follow, Group, Post
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_group(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._old_group_id = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_notify(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        live.publish(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_count(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        counters.change_group(instance.group_id, 1)
+        return
+    old_group_id = getattr(instance, '_old_group_id', instance.group_id)
+    if old_group_id != instance.group_id:
+        counters.change_group(old_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_uncount(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+    counters.change_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def post_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindex(sender, instance, **kwargs):
+    search.unindex(instance.pk)
+
+
+@receiver(post_migrate)
+def search_create_table(sender, using='default', **kwargs):
+    # Миграции в репозитории не хранятся, таблица FTS5 создаётся здесь.
+    if sender.name == 'posts':
+        search.create_table(using)
+
+
+@receiver(post_save, sender=Comment)
+def comment_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_uncount(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_cache(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        follows.followed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_cache(sender, instance, **kwargs):
+    follows.unfollowed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_remove(sender, instance, **kwargs):
+    timeline.remove(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_uncount(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_invalidate(sender, instance, **kwargs):
+    generations.bump('pages')
+    generations.bump('feed')
+    generations.bump('author', instance.author_id)
+    generations.bump('post', instance.pk)
+    group_ids = {instance.group_id, getattr(instance, '_old_group_id', None)}
+    for group_id in group_ids - {None}:
+        generations.bump('group', group_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_invalidate(sender, instance, **kwargs):
+    generations.bump('pages')
+    generations.bump('post', instance.post_id)
+
+
+def _group_authors(group):
+    return set(
+        group.posts.order_by().values_list('author', flat=True).distinct()
+    )
+
+
+@receiver(pre_delete, sender=Group)
+def group_remember_authors(sender, instance, **kwargs):
+    # SET_NULL отвяжет посты до post_delete и без сигналов Post.
+    instance._author_ids = _group_authors(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_invalidate(sender, instance, **kwargs):
+    # Ссылки на группу есть в карточках общей ленты и профилей авторов.
+    generations.bump('pages')
+    generations.bump('feed')
+    generations.bump('group', instance.pk)
+    author_ids = getattr(instance, '_author_ids', None)
+    if author_ids is None:
+        author_ids = _group_authors(instance)
+    for author_id in author_ids:
+        generations.bump('author', author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_invalidate(sender, instance, **kwargs):
+    generations.bump('pages')
+    generations.bump('author', instance.author_id)
+    generations.bump('author', instance.user_id)
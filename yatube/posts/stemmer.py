@@ -0,0 +1,132 @@
+"""
+Стеммер Snowball для русского языка.
+
+Отрезает окончания, чтобы «посты», «постами» и «посту» попадали
+в поисковый индекс одной основой. Слова на латинице остаются как есть.
+"""
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    (),
+    ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+     'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+     'ая', 'яя', 'ою', 'ею'),
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = (
+    (),
+    ('ся', 'сь'),
+)
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    (),
+    ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+     'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+     'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я'),
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+# Основы частых слов: при индексации текста почти все слова повторяются.
+STEM_CACHE = 100000
+
+
+def _regions(word):
+    """Начала областей RV и R2 по правилам Snowball."""
+    rv = next((i + 1 for i, char in enumerate(word) if char in VOWELS),
+              len(word))
+
+    def after_consonant(start):
+        for i in range(start + 1, len(word)):
+            if word[i] not in VOWELS and word[i - 1] in VOWELS:
+                return i + 1
+        return len(word)
+
+    r1 = after_consonant(0)
+    return rv, after_consonant(r1)
+
+
+def _remove(rv, groups):
+    """
+    Убирает самое длинное окончание из групп; окончания первой группы
+    должны идти после «а» или «я». None, если окончания нет.
+    """
+    first, second = groups
+    suffix = max(
+        (suffix for suffix in first + second if rv.endswith(suffix)),
+        key=len, default=None
+    )
+    if suffix is None:
+        return None
+    stem = rv[:-len(suffix)]
+    if suffix in second:
+        return stem
+    if stem.endswith(('а', 'я')):
+        return stem
+    return None
+
+
+def _remove_adjectival(rv):
+    stem = _remove(rv, ADJECTIVE)
+    if stem is None:
+        return None
+    participle = _remove(stem, PARTICIPLE)
+    return stem if participle is None else participle
+
+
+@lru_cache(maxsize=STEM_CACHE)
+def stem(word: str) -> str:
+    word = word.lower().replace('ё', 'е')
+    rv_start, r2_start = _regions(word)
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    stemmed = _remove(rv, PERFECTIVE_GERUND)
+    if stemmed is None:
+        reflexive = _remove(rv, REFLEXIVE)
+        if reflexive is not None:
+            rv = reflexive
+        for step in (_remove_adjectival,
+                     lambda rv: _remove(rv, VERB),
+                     lambda rv: _remove(rv, NOUN)):
+            stemmed = step(rv)
+            if stemmed is not None:
+                break
+    if stemmed is not None:
+        rv = stemmed
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    for suffix in DERIVATIONAL:
+        if rv.endswith(suffix) and rv_start + len(rv) - len(suffix) >= \
+                r2_start:
+            rv = rv[:-len(suffix)]
+            break
+
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        for suffix in SUPERLATIVE:
+            if rv.endswith(suffix):
+                rv = rv[:-len(suffix)]
+                if rv.endswith('нн'):
+                    rv = rv[:-1]
+                break
+        else:
+            if rv.endswith('ь'):
+                rv = rv[:-1]
+    return prefix + rv
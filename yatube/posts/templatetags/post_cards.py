@@ -0,0 +1,17 @@
+from django import template
+
+from posts import cards
+
+register = template.Library()
+
+
+@register.inclusion_tag(cards.TEMPLATE)
+def post_cards(posts, group_links=True, empty='', follows=None):
+    """
+    Карточки страницы постов одним проходом шаблона; group_links -
+    ссылка на группу под карточкой, empty - текст для пустой страницы,
+    follows - подписки читателя для кнопок подписки. Фрагменты в общем
+    кеше шаблонов follows не передают: кнопки у каждого свои.
+    """
+    return {'cards': cards.cards(posts, group_links, follows),
+            'empty': empty}
@@ -0,0 +1,31 @@
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """
+    Проверки бюджета SQL-запросов для view-функций.
+
+    Бюджет задаётся явно, а assertQueryBudgetStable дополнительно
+    проверяет, что число запросов не растёт вместе с размером страницы.
+    """
+
+    def assertQueryBudget(self, budget, client, url, method='get',
+                          **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(client, method)(url, **kwargs)
+        queries = '\n'.join(query['sql'] for query in context.captured_queries)
+        self.assertLessEqual(
+            len(context), budget,
+            f'{url}: {len(context)} запросов при бюджете {budget}:\n{queries}'
+        )
+        return response
+
+    def assertQueryBudgetStable(self, budget, client, url, page_sizes,
+                                target='posts.views.POST_ON_PAGE'):
+        for page_size in page_sizes:
+            with self.subTest(url=url, page_size=page_size):
+                with mock.patch(target, page_size):
+                    self.assertQueryBudget(budget, client, url)
@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import counters
+from posts.admin import PostAdmin
+from posts.models import Comment, Follow, Group, Post
+from posts.tests.query_budget import QueryBudgetMixin
+
+User = get_user_model()
+PAGE_SIZES = (2, 5, 10)
+# Удаление пачки: сессия, выборка, подсчёт по постам, DELETE, счётчики.
+DELETE_BUDGET = 10
+
+
+class AdminChangelistTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        authors = [User.objects.create_user(username=f'author{num}')
+                   for num in range(4)]
+        cls.posts = [
+            Post.objects.create(author=authors[num % 4], group=cls.group,
+                                text=f'Пост {num}')
+            for num in range(12)
+        ]
+        for num, post in enumerate(cls.posts):
+            Comment.objects.create(post=post, author=authors[num % 4],
+                                   text=f'Комментарий {num}')
+        for user in authors:
+            for author in authors:
+                if user != author:
+                    Follow.objects.create(user=user, author=author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_changelists_use_constant_queries(self):
+        """Число запросов списка не зависит от размера страницы."""
+        budgets = {'post': 9, 'comment': 7, 'follow': 5}
+        for model, budget in budgets.items():
+            url = reverse(f'admin:posts_{model}_changelist')
+            self.assertQueryBudgetStable(
+                budget, self.client, url, PAGE_SIZES,
+                target=f'posts.admin.{model.title()}Admin.list_per_page'
+            )
+
+    def test_keyset_navigation(self):
+        """Следующая страница открывается по курсору без пропусков."""
+        url = reverse('admin:posts_post_changelist')
+        seen = []
+        with mock.patch.object(PostAdmin, 'list_per_page', 5):
+            response = self.client.get(url)
+            while True:
+                cl = response.context['cl']
+                seen += [post.pk for post in cl.result_list]
+                if not cl.next_url:
+                    break
+                response = self.client.get(url + cl.next_url)
+        expected = sorted(self.posts, key=lambda post: (post.pub_date,
+                                                        post.pk),
+                          reverse=True)
+        self.assertEqual(seen, [post.pk for post in expected])
+
+    def test_remove_from_group_updates_counter(self):
+        """Массовое действие правит счётчик постов группы."""
+        self.client.post(reverse('admin:posts_post_changelist'), {
+            'action': 'remove_from_group',
+            'select_across': 1,
+            '_selected_action': [self.posts[0].pk],
+        })
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertFalse(Post.objects.filter(group=self.group).exists())
+
+    def test_delete_comments_updates_counters(self):
+        """Комментарии удаляются пачками, счётчики постов сходятся."""
+        post = self.posts[0]
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.admin, text=f'Ещё {num}')
+            for num in range(30)
+        )
+        counters.change_post(post.pk, 30)
+        with mock.patch('posts.admin.generations.bump') as bump:
+            self.assertQueryBudget(
+                DELETE_BUDGET, self.client,
+                reverse('admin:posts_comment_changelist'), method='post',
+                data={
+                    'action': 'delete_comments',
+                    '_selected_action': list(
+                        post.comments.values_list('pk', flat=True)
+                    ),
+                }
+            )
+        self.assertEqual(bump.call_count, 2)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(Comment.objects.count(), len(self.posts) - 1)
@@ -0,0 +1,48 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.management.commands.benchmark import Command, percentile
+
+
+class BenchmarkCommandTest(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_every_route_is_measured(self):
+        """Каждый маршрут posts, users и about попадает в отчёт."""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command('benchmark', '--in-place', '--users=4',
+                         '--groups=1', '--posts=12', '--comments=10',
+                         '--follows=3', '--images=1', '--iterations=2',
+                         '--warmup=0', f'--output={output}',
+                         stdout=io.StringIO())
+            with open(output, encoding='utf-8') as file:
+                report = json.load(file)
+            stdout = io.StringIO()
+            Command(stdout=stdout).compare(report, output)
+        routes = report['routes']
+        for name in ('posts:index', 'posts:post_detail', 'posts:search',
+                     'users:login', 'about:tech'):
+            self.assertIn(name, routes)
+        for name, row in routes.items():
+            with self.subTest(name=name):
+                self.assertLess(row['status'], 500)
+                self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+        self.assertEqual(routes['posts:post_edit']['status'], 200)
+        self.assertIn('Сравнение с', stdout.getvalue())
+
+    def test_cards_benchmark(self):
+        """Замер карточек печатает цену карточки до и после."""
+        stdout = io.StringIO()
+        call_command('benchmark_cards', '--cards=3', '--iterations=2',
+                     '--repeat=1', stdout=stdout)
+        self.assertEqual(stdout.getvalue().count('мкс на карточку'), 2)
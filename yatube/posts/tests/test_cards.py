@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.template import Context, Template
+from django.test import TestCase
+from django.urls import clear_script_prefix, set_script_prefix
+
+from posts import cards
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Пост в группе')
+        Post.objects.create(author=cls.user, text='Пост без группы')
+
+    def render(self, source, **context):
+        posts = list(Post.objects.for_feed().order_by('pk'))
+        for post in posts:
+            post.picture = None
+        return Template('{% load post_cards %}' + source).render(
+            Context({'posts': posts, **context})
+        )
+
+    def test_cards_links(self):
+        """Карточки ссылаются на автора, пост и группу, если она есть."""
+        html = self.render('{% post_cards posts %}')
+        self.assertEqual(html.count('<article>'), 2)
+        self.assertEqual(html.count('href="/profile/author/"'), 2)
+        self.assertIn(f'href="/posts/{self.post.pk}/"', html)
+        self.assertEqual(html.count('href="/group/group/"'), 1)
+        self.assertEqual(html.count('<hr>'), 1)
+
+    def test_without_group_links(self):
+        html = self.render('{% post_cards posts group_links=False %}')
+        self.assertNotIn('/group/group/', html)
+
+    def test_empty(self):
+        html = Template(
+            "{% load post_cards %}{% post_cards posts empty='Пусто' %}"
+        ).render(Context({'posts': []}))
+        self.assertIn('<p>Пусто</p>', html)
+
+    def test_cached_reverse_follows_script_prefix(self):
+        """Запомненный URL зависит от префикса, под которым стоит сайт."""
+        self.assertEqual(cards.cached_reverse('posts:post_detail', 5),
+                         '/posts/5/')
+        set_script_prefix('/blog/')
+        try:
+            self.assertEqual(cards.cached_reverse('posts:post_detail', 5),
+                             '/blog/posts/5/')
+        finally:
+            clear_script_prefix()
+        self.assertEqual(cards.cached_reverse('posts:post_detail', 5),
+                         '/posts/5/')
@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import follows
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+class FollowSetTest(TestCase):
+    def test_operations(self):
+        follow_set = follows.FollowSet(1, [5, 3, 9, 3])
+        self.assertEqual(list(follow_set), [3, 5, 9])
+        self.assertIn(5, follow_set)
+        self.assertNotIn(4, follow_set)
+        restored = follows.FollowSet.from_bytes(1, follow_set.to_bytes())
+        self.assertEqual(list(restored), [3, 5, 9])
+
+
+class FollowCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'author{num}')
+                       for num in range(3)]
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+        for author in cls.authors:
+            Post.objects.create(author=author, text=f'Пост {author}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_loaded_once(self):
+        """Подписки читаются из базы один раз, дальше из кеша."""
+        with self.assertNumQueries(1):
+            self.assertEqual(list(follows.load(self.reader.pk)),
+                             [self.authors[0].pk])
+        with self.assertNumQueries(0):
+            follows.load(self.reader.pk)
+
+    def test_follow_and_unfollow_reset_cache(self):
+        """Подписка и отписка сбрасывают кеш, а не правят его на месте."""
+        follows.load(self.reader.pk)
+        with mock.patch('posts.follows.transaction.on_commit',
+                        side_effect=lambda func: func()):
+            self.client.get(reverse('posts:profile_follow',
+                                    args=[self.authors[1].username]))
+            self.client.get(reverse('posts:profile_unfollow',
+                                    args=[self.authors[0].username]))
+        with self.assertNumQueries(1):
+            follow_set = follows.load(self.reader.pk)
+        self.assertEqual(list(follow_set), [self.authors[1].pk])
+
+    def test_follow_with_stale_cache(self):
+        """Отставший кеш не ломает повторную подписку и сбрасывается."""
+        cache.set(f'follows:{self.reader.pk}',
+                  follows.FollowSet(self.reader.pk).to_bytes())
+        response = self.client.get(reverse('posts:profile_follow',
+                                           args=[self.authors[0].username]))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 1)
+        self.assertEqual(list(follows.load(self.reader.pk)),
+                         [self.authors[0].pk])
+
+    def test_forget(self):
+        follows.load(self.reader.pk)
+        Follow.objects.bulk_create([Follow(user=self.reader,
+                                           author=self.authors[2])])
+        follows.forget([self.reader.pk])
+        self.assertIn(self.authors[2].pk, follows.load(self.reader.pk))
+
+    def test_profile_following_from_cache(self):
+        """Профиль узнаёт о подписке без запроса к таблице подписок."""
+        follows.load(self.reader.pk)
+        url = reverse('posts:profile', args=[self.authors[0].username])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertTrue(response.context['following'])
+        for query in context.captured_queries:
+            self.assertNotIn('posts_follow', query['sql'])
+
+    def test_buttons_for_page_of_authors(self):
+        """Поиск выводит кнопки подписки для всех авторов страницы."""
+        response = self.client.get(reverse('posts:search'), {'q': 'Пост'})
+        content = response.content.decode()
+        self.assertIn(reverse('posts:profile_unfollow',
+                              args=[self.authors[0].username]), content)
+        for author in self.authors[1:]:
+            self.assertIn(reverse('posts:profile_follow',
+                                  args=[author.username]), content)
+        self.assertEqual(content.count('role="button">Подписаться'), 2)
+
+    def test_no_buttons_for_anonymous(self):
+        response = Client().get(reverse('posts:search'), {'q': 'Пост'})
+        self.assertNotIn('Подписаться', response.content.decode())
@@ -5,10 +5,16 @@ from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 from posts.models import Group, Post, Comment
+from posts import thumbnails
 # from posts.forms import PostForm, CommentForm
 
+import io
+import os
 import shutil
 import tempfile
+from unittest import mock
+
+from PIL import Image
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -42,6 +48,10 @@ class PostCreateFormTests(TestCase):
     def setUp(self):
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
+        # Фоновые миниатюры пережили бы временный MEDIA_ROOT теста.
+        schedule = mock.patch('posts.thumbnails.schedule')
+        schedule.start()
+        self.addCleanup(schedule.stop)
 
     def test_create_post(self):
         """Валидная форма создает запись в Post."""
@@ -207,3 +217,89 @@ class PostCreateFormTests(TestCase):
         )
         self.assertEqual(Comment.objects.filter(post=self.post).count(),
                          comments_count)
+
+    def test_image_upload_schedules_thumbnails(self):
+        """Загрузка картинки ставит создание миниатюр в очередь."""
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x01\x00'
+            b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+            b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+            b'\x00\x00\x01\x00\x01\x00\x00\x02'
+            b'\x02\x4c\x01\x00\x3b'
+        )
+        uploaded_image = SimpleUploadedFile(
+            name='image3.gif',
+            content=small_gif,
+            content_type='image/gif'
+        )
+        with mock.patch('posts.forms.transaction.on_commit',
+                        side_effect=lambda func: func()), \
+                mock.patch('posts.thumbnails.schedule') as schedule:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Пост с картинкой', 'image': uploaded_image}
+            )
+        post = Post.objects.get(text='Пост с картинкой')
+        schedule.assert_called_once_with(post.image.name)
+
+        thumbnails.generate(post.image.name)
+        cache_dir = os.path.join(TEMP_MEDIA_ROOT, 'cache')
+        self.assertTrue(any(files for _, _, files in os.walk(cache_dir)))
+        post.delete()
+
+    def make_jpeg(self, size, orientation=None):
+        image = Image.new('RGB', size, 'red')
+        exif = Image.Exif()
+        if orientation:
+            exif[0x0112] = orientation
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', exif=exif.tobytes())
+        return SimpleUploadedFile(name='photo.jpg',
+                                  content=buffer.getvalue(),
+                                  content_type='image/jpeg')
+
+    @override_settings(POST_IMAGE_MAX_SIDE=1000)
+    def test_uploaded_image_is_normalized(self):
+        """Картинка уменьшается, поворачивается по EXIF и теряет EXIF."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с фото',
+                  'image': self.make_jpeg((4000, 1000), orientation=6)}
+        )
+        post = Post.objects.get(text='Пост с фото')
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (250, 1000))
+            self.assertEqual(len(stored.getexif()), 0)
+        post.delete()
+
+    def test_upload_stores_placeholder(self):
+        """При загрузке картинки сохраняется заглушка data URI."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с заглушкой',
+                  'image': self.make_jpeg((800, 600))}
+        )
+        post = Post.objects.get(text='Пост с заглушкой')
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/png;base64,')
+        )
+        self.assertLess(len(post.image_placeholder), 1024)
+        post.delete()
+
+    def test_image_limits_are_checked_before_decoding(self):
+        """Слишком большие файлы и картинки отклоняются формой."""
+        limits = {
+            'POST_IMAGE_MAX_BYTES': 10,
+            'POST_IMAGE_MAX_PIXELS': 100,
+        }
+        posts_count = Post.objects.count()
+        for setting, value in limits.items():
+            with self.subTest(setting=setting), \
+                    self.settings(**{setting: value}):
+                response = self.authorized_client.post(
+                    reverse('posts:post_create'),
+                    data={'text': 'Огромная картинка',
+                          'image': self.make_jpeg((20, 20))}
+                )
+                self.assertTrue(response.context['form'].errors['image'])
+        self.assertEqual(Post.objects.count(), posts_count)
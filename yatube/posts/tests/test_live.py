@@ -0,0 +1,97 @@
+import asyncio
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from core.asgi import LOOP_KEY
+from core.broker import broker
+from posts import live
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+class FollowEventsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.old = Post.objects.create(author=cls.author, text='Старый пост')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def events(self, **params):
+        response = self.client.get(reverse('posts:follow_events'), params)
+        self.assertEqual(response['Content-Type'], live.CONTENT_TYPE)
+        return response.content.decode()
+
+    def test_missed_posts_are_counted(self):
+        """После переподключения приходят посты, вышедшие без клиента."""
+        Post.objects.create(author=self.author, text='Новый пост')
+        Post.objects.create(author=self.other, text='Чужой пост')
+        content = self.events(after=self.old.pk)
+        self.assertIn('event: posts\ndata: {"new": 1}', content)
+        self.assertEqual(broker.subscribers(live.channel(self.author.pk)),
+                         0)
+
+    def test_feed_page_subscribes_to_events(self):
+        response = self.client.get(reverse('posts:follow_index'),
+                                   **{LOOP_KEY: object()})
+        self.assertEqual(response.context['latest_id'], self.old.pk)
+        self.assertContains(response, reverse('posts:follow_events'))
+
+    def test_no_events_under_wsgi(self):
+        """Под WSGI страница не держит воркер открытым EventSource."""
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, reverse('posts:follow_events'))
+
+    def test_guest_is_redirected(self):
+        response = Client().get(reverse('posts:follow_events'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_wsgi_response_does_not_wait(self):
+        """Без пропущенных постов - сразу ответ с долгим retry."""
+        content = self.events(after=self.old.pk)
+        self.assertEqual(content, f'retry: {live.POLL_RETRY}\n\n')
+
+
+class FollowEventsPublishTest(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.other = User.objects.create_user(username='other')
+
+    def test_new_post_reaches_followers_only(self):
+        """Пост после коммита получают только подписчики автора."""
+        subscription = live.subscribe([self.author.pk])
+        try:
+            Post.objects.create(author=self.other, text='Чужой пост')
+            post = Post.objects.create(author=self.author, text='Пост')
+            self.assertEqual(subscription.wait(1), [post.pk])
+        finally:
+            subscription.close()
+
+    def test_async_stream_waits_in_event_loop(self):
+        async def read():
+            subscription = live.subscribe(
+                [self.author.pk], loop=asyncio.get_running_loop()
+            )
+            stream = live.EventStream(subscription).stream()
+            try:
+                chunks = [await stream.__anext__(),
+                          await stream.__anext__()]
+                broker.publish(live.channel(self.author.pk), 7)
+                broker.publish(live.channel(self.author.pk), 8)
+                chunks.append(await stream.__anext__())
+            finally:
+                await stream.aclose()
+                subscription.close()
+            return chunks
+
+        retry, ping, event = asyncio.run(read())
+        self.assertEqual(ping, ': ping\n\n')
+        self.assertEqual(event, 'id: 8\nevent: posts\ndata: {"new": 2}\n\n')
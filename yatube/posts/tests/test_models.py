@@ -1,6 +1,9 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
-from ..models import Post, Group
+from ..models import Post, Group, Comment, Follow, UserCounter
 
 
 User = get_user_model()
@@ -30,3 +33,91 @@ class PostModelTest(TestCase):
         for field, testing_model in models_list.items():
             with self.subTest(field=field):
                 self.assertEqual(str(testing_model), field)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Тестовое описание'
+        )
+
+    def counters(self, user):
+        return UserCounter.objects.get(user=user)
+
+    def test_post_and_comment_counters(self):
+        """Счётчики постов и комментариев следуют за записями."""
+        post = Post.objects.create(author=self.author, text='Пост',
+                                   group=self.group)
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_save_keeps_concurrent_counters(self):
+        """save() устаревшего объекта не затирает счётчики из базы."""
+        post = Post.objects.create(author=self.author, text='Пост',
+                                   group=self.group)
+        group = Group.objects.get(pk=self.group.pk)
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        Post.objects.create(author=self.author, text='Ещё', group=self.group)
+        post.text = 'Исправленный пост'
+        post.save()
+        group.title = 'Новое название'
+        group.save()
+        post.refresh_from_db()
+        group.refresh_from_db()
+        self.assertEqual(post.text, 'Исправленный пост')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(group.title, 'Новое название')
+        self.assertEqual(group.posts_count, 2)
+
+    def test_follow_counters(self):
+        """Подписка меняет счётчики подписчиков и подписок."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_recount_repairs_counters(self):
+        """Команда recount исправляет разошедшиеся счётчики."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text='Пост', group=self.group)
+            for _ in range(3)
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserCounter.objects.filter(user=self.author).update(
+            followers_count=7
+        )
+        call_command('recount', stdout=StringIO())
+        counters = self.counters(self.author)
+        self.assertEqual(counters.posts_count, 3)
+        self.assertEqual(counters.followers_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 3)
@@ -0,0 +1,172 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+
+from posts import follows, thumbnails
+from posts.models import Comment, Follow, Group, Post
+from posts.tests.query_budget import QueryBudgetMixin
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+PAGE_SIZES = (1, 5, 10)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create_user(username=f'author{num}',
+                                     first_name=f'Имя{num}')
+            for num in range(3)
+        ]
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание группы'
+        )
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        for num in range(30):
+            Post.objects.create(
+                author=cls.authors[num % 3],
+                text=f'Тестовый пост {num}',
+                group=cls.group if num % 2 else None
+            )
+        cls.post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.authors[num % 3],
+                    text=f'Комментарий {num}')
+            for num in range(15)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_feeds_query_budget(self):
+        """Ленты выполняют фиксированное число запросов."""
+        author = self.authors[0].username
+        budgets = {
+            reverse('posts:index'): 2,
+            reverse('posts:group_list', args=[self.group.slug]): 3,
+            reverse('posts:profile', args=[author]): 3,
+        }
+        for url, budget in budgets.items():
+            self.assertQueryBudgetStable(budget, self.guest_client, url,
+                                         PAGE_SIZES)
+
+    def test_follow_index_query_budget(self):
+        """Лента подписок выполняет фиксированное число запросов."""
+        # Два запроса уходят на сессию и пользователя. Подписки читаются
+        # из базы один раз, дальше - из кеша.
+        follows.load(self.reader.pk)
+        self.assertQueryBudgetStable(
+            5, self.authorized_client, reverse('posts:follow_index'),
+            PAGE_SIZES
+        )
+
+    def test_post_detail_query_budget(self):
+        """Комментарии с авторами загружаются фиксированным числом запросов."""
+        self.assertQueryBudget(
+            2, self.guest_client,
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+
+    def test_view_queries_use_indexes(self):
+        """Запросы страниц не читают таблицы целиком и не сортируют."""
+        call_command('explain_views', stdout=io.StringIO())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailBatchTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user,
+                text=f'Пост с картинкой {num}',
+                image=SimpleUploadedFile(name=f'image{num}.gif',
+                                         content=SMALL_GIF,
+                                         content_type='image/gif')
+            )
+            for num in range(6)
+        ]
+        for post in cls.posts:
+            thumbnails.generate(post.image)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_page_thumbnails_use_one_lookup(self):
+        """Миниатюры страницы ищутся одним запросом при любом её размере."""
+        for page_size in (1, 3, 6):
+            with self.subTest(page_size=page_size):
+                cache.clear()
+                with self.settings(PAGE_CACHE_ENABLED=False), \
+                        CaptureQueriesContext(connection) as context, \
+                        mock.patch('posts.views.POST_ON_PAGE', page_size):
+                    response = Client().get(reverse('posts:index'))
+                kvstore_queries = [
+                    query for query in context.captured_queries
+                    if 'thumbnail_kvstore' in query['sql']
+                ]
+                self.assertEqual(len(kvstore_queries), 1)
+                geometry, options = thumbnails.CARD_THUMBNAIL
+                for post in response.context['page_obj']:
+                    url = get_thumbnail(post.image, geometry, **options).url
+                    self.assertContains(response, url)
+
+    def test_missing_variants_are_queued(self):
+        """Без миниатюр страница отдаёт оригинал и ставит их в очередь."""
+        post = Post.objects.create(
+            author=self.user, text='Пост без миниатюр',
+            image=SimpleUploadedFile(name='fresh.gif', content=SMALL_GIF,
+                                     content_type='image/gif')
+        )
+        with self.settings(PAGE_CACHE_ENABLED=False), \
+                mock.patch('posts.thumbnails.schedule') as schedule:
+            response = Client().get(reverse('posts:post_detail',
+                                            args=[post.pk]))
+        schedule.assert_called_once_with(post.image.name)
+        self.assertContains(response, f'src="{post.image.url}"')
+        self.assertNotContains(response, '<source')
+
+    def test_page_serves_responsive_variants(self):
+        """Карточка отдаёт все ширины и форматы через <picture>."""
+        with self.settings(PAGE_CACHE_ENABLED=False):
+            response = Client().get(reverse('posts:index'))
+        post = response.context['page_obj'][0]
+        for geometry, options in thumbnails.THUMBNAIL_SPECS:
+            url = get_thumbnail(post.image, geometry, **options).url
+            self.assertContains(response, url)
+        for _, mime in thumbnails.FORMATS:
+            self.assertContains(response, f'type="{mime}"')
+        self.assertContains(response, 'loading="lazy"')
@@ -0,0 +1,95 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post
+from posts.stemmer import stem
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE_ENABLED=False)
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.cats = Post.objects.create(
+            author=cls.user,
+            text='Коты и кошки: кошка, кошку и кошкам.'
+        )
+        cls.dogs = Post.objects.create(
+            author=cls.user,
+            text='Собаки любят гулять, кошки - нет.'
+        )
+        cls.python = Post.objects.create(
+            author=cls.user,
+            text='Программирование на Python'
+        )
+
+    def found(self, query):
+        response = Client().get(reverse('posts:search'), {'q': query})
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_stemmer(self):
+        """Разные формы слова дают одну основу."""
+        for words in (('посты', 'постами', 'посту'),
+                      ('кошки', 'кошкам', 'кошка')):
+            with self.subTest(words=words):
+                self.assertEqual(len({stem(word) for word in words}), 1)
+
+    def test_search_uses_word_forms(self):
+        """Поиск находит посты по другой форме слова."""
+        self.assertEqual(self.found('программированием'), [self.python.pk])
+        self.assertEqual(self.found('собака'), [self.dogs.pk])
+
+    def test_results_are_ranked(self):
+        """Пост, где слово встречается чаще, идёт первым."""
+        self.assertEqual(self.found('кошка'),
+                         [self.cats.pk, self.dogs.pk])
+
+    def test_query_without_words(self):
+        """Запрос из одних знаков препинания даёт пустую выдачу."""
+        for query in ('!', '"', '***'):
+            with self.subTest(query=query):
+                self.assertEqual(self.found(query), [])
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при правке и удалении поста."""
+        post = Post.objects.get(pk=self.python.pk)
+        post.text = 'Теперь про Django'
+        post.save()
+        self.assertEqual(self.found('программирование'), [])
+        self.assertEqual(self.found('django'), [self.python.pk])
+        Post.objects.get(pk=self.dogs.pk).delete()
+        self.assertEqual(self.found('собаки'), [])
+
+    def test_results_use_cursor_pagination(self):
+        """Выдача листается курсором по релевантности."""
+        for num in range(12):
+            Post.objects.create(author=self.user, text=f'Кот номер {num}')
+        with self.settings(POSTS_PAGINATION='cursor'):
+            first = Client().get(reverse('posts:search'), {'q': 'кот'})
+            page_obj = first.context['page_obj']
+            second = Client().get(
+                f"{reverse('posts:search')}?{page_obj.next_query}"
+            )
+        pks = [post.pk for post in page_obj]
+        pks += [post.pk for post in second.context['page_obj']]
+        self.assertEqual(len(pks), 13)
+        self.assertEqual(len(set(pks)), 13)
+
+    def test_rebuild(self):
+        """rebuild заново индексирует все посты."""
+        self.assertEqual(search.rebuild(), Post.objects.count())
+        self.assertEqual(self.found('коты'), [self.cats.pk])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по индексу."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'собаками'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.dogs])
@@ -0,0 +1,137 @@
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core import generations
+from posts import search, transfer
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TransferTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author',
+                                              first_name='Лев')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.old_date = timezone.now() - timedelta(days=30)
+        for num in range(5):
+            post = Post.objects.create(author=cls.author,
+                                       group=cls.group if num % 2 else None,
+                                       text=f'Пост про котов {num}')
+            Comment.objects.create(post=post, author=cls.reader,
+                                   text=f'Комментарий {num}')
+        Post.objects.update(pub_date=cls.old_date)
+
+    def export(self):
+        stream = io.StringIO()
+        totals = transfer.export(stream, chunk=2)
+        self.assertEqual(totals['post'], 5)
+        return stream.getvalue()
+
+    def test_export_is_ndjson(self):
+        lines = self.export().splitlines()
+        records = [json.loads(line) for line in lines]
+        kinds = [record['model'] for record in records]
+        self.assertEqual(kinds, sorted(kinds, key=[
+            'group', 'user', 'post', 'comment', 'follow'
+        ].index))
+        post = next(record for record in records
+                    if record['model'] == 'post')
+        self.assertEqual(post['author'], 'author')
+
+    def test_round_trip(self):
+        """Выгрузка загружается в пустую базу с датами и производными."""
+        data = self.export()
+        post_ids = set(Post.objects.values_list('pk', flat=True))
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+        totals = transfer.Importer(chunk=2).load(io.StringIO(data))
+
+        self.assertEqual(totals['post'], 5)
+        self.assertEqual(set(Post.objects.values_list('pk', flat=True)),
+                         post_ids)
+        self.assertEqual(Comment.objects.count(), 5)
+        post = Post.objects.select_related('author', 'group').filter(
+            group__isnull=False).first()
+        self.assertEqual(post.pub_date, self.old_date)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.group.posts_count, 2)
+        self.assertEqual(post.author.counters.posts_count, 5)
+        self.assertEqual(post.author.counters.followers_count, 1)
+        reader = User.objects.get(username='reader')
+        self.assertEqual(TimelineEntry.objects.filter(user=reader).count(),
+                         5)
+        if search.available():
+            self.assertEqual(len(search.search('кот')), 5)
+
+    def test_second_import_adds_nothing(self):
+        data = self.export()
+        totals = transfer.Importer().load(io.StringIO(data))
+        self.assertEqual(totals['post'], 0)
+        self.assertEqual(totals['comment'], 0)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_import_remaps_taken_ids(self):
+        """Занятый чужим постом id не теряет пост и его комментарии."""
+        data = self.export()
+        first_id = Post.objects.order_by('pk').first().pk
+        Post.objects.all().delete()
+        stranger = User.objects.create_user(username='stranger')
+        Post.objects.create(id=first_id, author=stranger, text='Чужой пост')
+
+        for _ in range(2):
+            transfer.Importer(chunk=2).load(io.StringIO(data))
+
+        self.assertEqual(Post.objects.get(pk=first_id).text, 'Чужой пост')
+        self.assertEqual(Post.objects.filter(author=self.author).count(), 5)
+        self.assertEqual(Comment.objects.count(), 5)
+        for comment in Comment.objects.select_related('post'):
+            self.assertEqual(comment.text[-1], comment.post.text[-1])
+
+    def test_second_import_keeps_cache(self):
+        """Загрузка без новых объектов не сбрасывает поколения кеша."""
+        data = self.export()
+        pages = generations.get('pages')
+        author = generations.get('author', self.author.pk)
+        transfer.Importer().load(io.StringIO(data))
+        self.assertEqual(generations.get('pages'), pages)
+        self.assertEqual(generations.get('author', self.author.pk), author)
+
+    def test_broken_file(self):
+        for data in ('не json\n', '{"model": "secret"}\n',
+                     '{"model": "post", "id": 999, "author": "nobody", '
+                     '"group": null, "text": "", "pub_date": null, '
+                     '"image": "", "image_placeholder": ""}\n'):
+            with self.subTest(data=data):
+                importer = transfer.Importer()
+                with self.assertRaises(ValueError):
+                    importer.load(io.StringIO(data))
+
+    def test_commands_use_gzip_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dump.ndjson.gz')
+            call_command('export_posts', path, stderr=io.StringIO())
+            Post.objects.all().delete()
+            stdout = io.StringIO()
+            call_command('import_posts', path, stdout=stdout)
+        self.assertIn('post: 5', stdout.getvalue())
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_import_command_reports_errors(self):
+        with self.assertRaises(CommandError):
+            call_command('import_posts', '/nonexistent.ndjson',
+                         stdout=io.StringIO())
@@ -37,7 +37,8 @@ class PostURLTests(TestCase):
             '/',
             '/group/test_slug/',
             '/profile/testuser/',
-            '/posts/1/'
+            '/posts/1/',
+            '/search/?q=пост'
         ]
         for url in unauthorized_url_pages:
             with self.subTest(url=url):
@@ -65,7 +66,8 @@ class PostURLTests(TestCase):
             '/profile/testuser/': 'posts/profile.html',
             '/posts/1/': 'posts/post_detail.html',
             '/create/': 'posts/create_post.html',
-            '/posts/1/edit/': 'posts/create_post.html'
+            '/posts/1/edit/': 'posts/create_post.html',
+            '/search/': 'posts/search.html'
         }
         for url, template in url_templates_names.items():
             with self.subTest(url=url):
@@ -6,9 +6,10 @@ from django.urls import reverse
 from django.conf import settings
 from django import forms
 from http import HTTPStatus
+from unittest import mock
 
-from posts.views import POST_ON_PAGE
-from posts.models import Group, Post, Comment, Follow
+from posts.views import COMMENTS_ON_PAGE, POST_ON_PAGE
+from posts.models import Group, Post, Comment, Follow, TimelineEntry
 
 import shutil
 import tempfile
@@ -78,6 +79,10 @@ class PostsTest(TestCase):
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user1)
+        # Фоновые миниатюры пережили бы временный MEDIA_ROOT теста.
+        schedule = mock.patch('posts.thumbnails.schedule')
+        schedule.start()
+        self.addCleanup(schedule.stop)
 
     def test_pages_uses_correct_template(self):
         """URL-адрес использует соответствующий шаблон."""
@@ -304,6 +309,49 @@ class PaginatorTest(TestCase):
                     len(response.context['page_obj'].object_list), POST_ON_PAGE
                 )
 
+    def test_cursor_pages_cover_feed_without_duplicates(self):
+        """Курсоры next проходят всю ленту без пропусков и повторов."""
+        url = reverse('posts:index')
+        seen = []
+        query = ''
+        numbers = []
+        while query is not None:
+            page_obj = Client().get(f'{url}?{query}').context['page_obj']
+            numbers.append(page_obj.number)
+            seen.extend(post.pk for post in page_obj.object_list)
+            query = page_obj.next_query
+        self.assertEqual(numbers, [1, 2, 3, 4])
+        self.assertEqual(
+            seen,
+            list(Post.objects.order_by('-pub_date', '-id')
+                 .values_list('id', flat=True))
+        )
+
+    def test_cursor_page_has_bounded_window_and_previous(self):
+        """Навигация показывает только соседние страницы."""
+        url = reverse('posts:index')
+        first = Client().get(url).context['page_obj']
+        self.assertEqual([number for number, _ in first.window], [1, 2, 3])
+        third = Client().get(
+            f'{url}?{first.window[2][1]}'
+        ).context['page_obj']
+        self.assertEqual(third.number, 3)
+        self.assertEqual([number for number, _ in third.window],
+                         [1, 2, 3, 4])
+        second = Client().get(
+            f'{url}?{third.previous_query}'
+        ).context['page_obj']
+        self.assertEqual(second.number, 2)
+        self.assertEqual(list(second.object_list),
+                         list(Post.objects.order_by('-pub_date', '-id')
+                              [POST_ON_PAGE:POST_ON_PAGE * 2]))
+
+    def test_broken_cursor_returns_first_page(self):
+        """Некорректный курсор открывает первую страницу."""
+        response = Client().get(reverse('posts:index') + '?cursor=broken')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.context['page_obj'].number, 1)
+
 
 class FollowTest(TestCase):
     @classmethod
@@ -381,6 +429,49 @@ class FollowTest(TestCase):
                 0
             )
 
+    def test_follow_backfills_and_unfollow_clears_timeline(self):
+        """Подписка заполняет ленту, отписка очищает её."""
+        posts = Post.objects.bulk_create(
+            [Post(text=f'Старый пост {num}', author=self.user1)
+             for num in range(3)]
+        )
+        Follow.objects.create(user=self.user2, author=self.user1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user2).count(),
+            len(posts)
+        )
+        Follow.objects.get(user=self.user2, author=self.user1).delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user2).exists()
+        )
+        response = self.follower.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj'].object_list), 0)
+
+    def test_timeline_is_capped(self):
+        """В ленте хранится не больше TIMELINE_LENGTH записей."""
+        Follow.objects.create(user=self.user2, author=self.user1)
+        with mock.patch('posts.timeline.TIMELINE_LENGTH', 3):
+            for num in range(5):
+                Post.objects.create(text=f'Пост {num}', author=self.user1)
+        entries = TimelineEntry.objects.filter(user=self.user2)
+        self.assertEqual(entries.count(), 3)
+        self.assertEqual(
+            set(entries.values_list('post__text', flat=True)),
+            {'Пост 2', 'Пост 3', 'Пост 4'}
+        )
+
+    def test_popular_author_is_merged_on_read(self):
+        """Посты популярного автора подмешиваются в ленту при чтении."""
+        Follow.objects.create(user=self.user2, author=self.user1)
+        with mock.patch('posts.timeline.FANOUT_LIMIT', 1):
+            post = Post.objects.create(text='Популярный пост',
+                                       author=self.user1)
+            self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+            response = self.follower.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj'].object_list), [post]
+        )
+
 
 class CacheTest(TestCase):
     @classmethod
@@ -397,16 +488,105 @@ class CacheTest(TestCase):
         cache.clear()
         post_text = self.post.text
         page_before = Client().get(reverse('posts:index')).content.decode()
+        # Обновление в обход модели не меняет поколение ленты.
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        page_cached = Client().get(reverse('posts:index')).content.decode()
         self.post.text = 'Измененный текст'
         self.post.save()
         page_after = Client().get(reverse('posts:index')).content.decode()
-        cache.clear()
-        page_with_new_text = Client().get(
-            reverse('posts:index')
-        ).content.decode()
         self.assertIn(post_text, page_before)
-        self.assertIn(post_text, page_after)
-        self.assertNotIn(post_text, page_with_new_text)
+        self.assertIn(post_text, page_cached)
+        self.assertNotIn(post_text, page_after)
+        self.assertIn('Измененный текст', page_after)
+
+    def test_generations_invalidate_fragments(self):
+        """Запись в группу, профиль или комментарии сбрасывает их кеш."""
+        cache.clear()
+        group = Group.objects.create(title='Группа', slug='cache_slug',
+                                     description='Описание')
+        urls = [
+            reverse('posts:group_list', args=[group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        ]
+        for url in urls:
+            Client().get(url)
+        post = Post.objects.create(author=self.user, text='Новый пост',
+                                   group=group)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertIn('Новый пост',
+                              Client().get(url).content.decode())
+
+        profile = urls[1]
+        group.slug = 'new_slug'
+        group.save()
+        self.assertIn(reverse('posts:group_list', args=['new_slug']),
+                      Client().get(profile).content.decode())
+        group.delete()
+        self.assertNotIn(reverse('posts:group_list', args=['new_slug']),
+                         Client().get(profile).content.decode())
+
+        detail = reverse('posts:post_detail', args=[post.pk])
+        Client().get(detail)
+        Comment.objects.create(post=post, author=self.user,
+                               text='Новый комментарий')
+        self.assertIn('Новый комментарий',
+                      Client().get(detail).content.decode())
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='commentator')
+        cls.post = Post.objects.create(author=cls.user, text='Вирусный пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {num}')
+            for num in range(COMMENTS_ON_PAGE * 2 + 5)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_renders_first_portion(self):
+        """Страница поста выводит только первую порцию комментариев."""
+        response = Client().get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        page = response.context['comments_page']
+        self.assertEqual(len(page['comments']), COMMENTS_ON_PAGE)
+        self.assertContains(response, page['next_url'])
+
+    def test_endpoint_loads_all_comments_once(self):
+        """Подгрузка по курсору проходит все комментарии без повторов."""
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        url += '?format=json'
+        seen = []
+        for _ in range(10):
+            data = Client().get(url).json()
+            seen += [comment['id'] for comment in data['comments']]
+            if not data['next']:
+                break
+            url = data['next'] + '&format=json'
+        expected = Comment.objects.filter(post=self.post).order_by(
+            '-created', '-id'
+        ).values_list('id', flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_endpoint_returns_html_fragment(self):
+        """Без format=json возвращается фрагмент HTML."""
+        response = Client().get(
+            reverse('posts:post_comments', args=[self.post.pk])
+        )
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertContains(response, 'js-more-comments')
+
+    def test_bad_cursor(self):
+        """Некорректный курсор - ошибка 400."""
+        response = Client().get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'cursor': 'мусор'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
 
 
 class CustomTemplatesError(TestCase):
@@ -0,0 +1,254 @@
+"""
+Заблаговременное создание миниатюр картинок постов.
+
+Миниатюры, которые выводят шаблоны, создаются сразу после загрузки
+картинки в ограниченном пуле потоков, а не при первом показе поста.
+Для каждой картинки готовится несколько ширин в современных форматах
+и в JPEG, шаблон отдаёт их через <picture> и srcset. Если каких-то
+вариантов ещё нет, страница показывает оригинал и ставит картинку в
+очередь; запрос сам миниатюры не создаёт.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils.functional import SimpleLazyObject
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import profiling
+
+logger = logging.getLogger(__name__)
+
+# Ширины вариантов картинки карточки; пропорции везде 960x339.
+CARD_WIDTHS = (480, 960, 1440)
+CARD_WIDTH = 960
+CARD_RATIO = 339 / 960
+# Подсказка браузеру о ширине карточки в вёрстке.
+CARD_SIZES = '(max-width: 1000px) 100vw, 960px'
+# Современные форматы в порядке предпочтения, JPEG - для остальных.
+MODERN_FORMATS = (
+    ('AVIF', 'image/avif'),
+    ('WEBP', 'image/webp'),
+)
+FALLBACK_FORMAT = 'JPEG'
+
+
+def _supported(image_format) -> bool:
+    # AVIF появится, когда его будут уметь сохранять и Pillow, и sorl.
+    Image.init()
+    return image_format in Image.SAVE and image_format in EXTENSIONS
+
+
+FORMATS = tuple(
+    (image_format, mime) for image_format, mime in MODERN_FORMATS
+    if _supported(image_format)
+)
+
+
+def _spec(width, image_format=FALLBACK_FORMAT):
+    return (f'{width}x{round(width * CARD_RATIO)}',
+            {'crop': 'center', 'upscale': True, 'format': image_format})
+
+
+# Все варианты картинки поста: (ширина, формат).
+VARIANTS = tuple(
+    (width, image_format)
+    for image_format in [name for name, _ in FORMATS] + [FALLBACK_FORMAT]
+    for width in CARD_WIDTHS
+)
+# Геометрия и параметры вариантов для get_thumbnail.
+THUMBNAIL_SPECS = tuple(_spec(*variant) for variant in VARIANTS)
+CARD_THUMBNAIL = _spec(CARD_WIDTH)
+THUMBNAIL_WORKERS = getattr(settings, 'THUMBNAIL_WORKERS', 2)
+# Сколько картинок может ждать в очереди; остальные попадут в неё
+# при следующем показе поста.
+THUMBNAIL_QUEUE = getattr(settings, 'THUMBNAIL_QUEUE', 32)
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(THUMBNAIL_WORKERS + THUMBNAIL_QUEUE)
+# Картинки в очереди или в работе: страницы не ставят их повторно.
+_queued = set()
+
+
+def generate(image):
+    """Создаёт все миниатюры картинки; image - FieldFile или имя файла."""
+    for geometry, options in THUMBNAIL_SPECS:
+        get_thumbnail(image, geometry, **options)
+
+
+def _executor_instance():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+        return _executor
+
+
+def _run(name):
+    close_old_connections()
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    finally:
+        # kvstore sorl пишет в базу из потока пула.
+        connection.close()
+        with _executor_lock:
+            _queued.discard(name)
+        _slots.release()
+
+
+def schedule(name) -> bool:
+    """
+    Ставит картинку в очередь; False, если очередь заполнена. Картинка,
+    которая уже в очереди, второй раз не ставится.
+    """
+    with _executor_lock:
+        if name in _queued:
+            return True
+        if not _slots.acquire(blocking=False):
+            logger.warning('Очередь миниатюр заполнена, пропускаем %s',
+                           name)
+            return False
+        _queued.add(name)
+    _executor_instance().submit(_run, name)
+    return True
+
+
+def _thumbnail_file(image, geometry, options):
+    """ImageFile миниатюры с тем же именем, что даст get_thumbnail."""
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in ThumbnailBackend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def _resolve(posts, variants):
+    """
+    Ищет все варианты картинок постов одним get_many кеша и одним
+    запросом к таблице kvstore; недостающих в ответе нет.
+    """
+    keys = {
+        (post.pk, variant): add_prefix(
+            _thumbnail_file(post.image, *_spec(*variant)).key
+        )
+        for post in posts
+        for variant in variants
+    }
+    kvstore = default.kvstore
+    values = {}
+    if isinstance(kvstore, KVStore) and keys:
+        values = {
+            key: value
+            for key, value in kvstore.cache.get_many(keys.values()).items()
+            if isinstance(value, str)
+        }
+        missing = set(keys.values()) - set(values)
+        if missing:
+            found = dict(
+                KVStoreModel.objects.filter(key__in=missing)
+                .values_list('key', 'value')
+            )
+            kvstore.cache.set_many(found,
+                                   sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(found)
+    return {
+        (pk, variant): deserialize_image_file(values[key])
+        for (pk, variant), key in keys.items()
+        if values.get(key)
+    }
+
+
+class Picture:
+    """
+    Варианты картинки поста для тега <picture>; без files - только
+    оригинал, пока миниатюры не готовы.
+    """
+
+    sizes = CARD_SIZES
+
+    def __init__(self, files, placeholder='', original=None):
+        self.files = files
+        self.placeholder = placeholder
+        self.original = original
+
+    def _srcset(self, image_format) -> str:
+        if not self.files:
+            return ''
+        return ', '.join(
+            f'{self.files[width, image_format].url} {width}w'
+            for width in CARD_WIDTHS
+        )
+
+    @property
+    def sources(self):
+        if not self.files:
+            return []
+        return [{'type': mime, 'srcset': self._srcset(image_format)}
+                for image_format, mime in FORMATS]
+
+    @property
+    def src(self):
+        if not self.files:
+            return self.original
+        return self.files[CARD_WIDTH, FALLBACK_FORMAT]
+
+    @property
+    def srcset(self) -> str:
+        return self._srcset(FALLBACK_FORMAT)
+
+
+def attach(posts):
+    """
+    Проставляет постам атрибут picture с вариантами картинки.
+
+    Варианты всей страницы ищутся разом при первом обращении, так что
+    если фрагмент взят из кеша шаблонов, хранилище не трогается вовсе.
+    """
+    posts = list(posts)
+    with_image = [post for post in posts if post.image]
+    resolved = None
+
+    def lookup(post):
+        nonlocal resolved
+        if resolved is None:
+            # Счётчик метрики - картинки, поставленные в очередь.
+            with profiling.timed('thumbnail', 0):
+                resolved = _resolve(with_image, VARIANTS)
+        if any((post.pk, variant) not in resolved for variant in VARIANTS):
+            profiling.count('thumbnail')
+            schedule(post.image.name)
+            return Picture({}, post.image_placeholder, post.image)
+        files = {variant: resolved[post.pk, variant]
+                 for variant in VARIANTS}
+        return Picture(files, post.image_placeholder)
+
+    for post in posts:
+        if post.image:
+            post.picture = SimpleLazyObject(lambda post=post: lookup(post))
+        else:
+            post.picture = None
+    return posts
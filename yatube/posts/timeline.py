@@ -0,0 +1,127 @@
+"""
+Материализованная лента подписок (fan-out on write).
+
+Новый пост сразу раскладывается в ленты подписчиков автора, поэтому
+follow_index читает один индексированный диапазон TimelineEntry.
+Посты авторов с очень большим числом подписчиков не раскладываются,
+а подмешиваются в ленту при чтении.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+
+from .models import Follow, Post, TimelineEntry, UserCounter
+
+# Сколько записей хранится в ленте одного пользователя.
+TIMELINE_LENGTH = getattr(settings, 'TIMELINE_LENGTH', 800)
+# Начиная с этого числа подписчиков лента автора собирается при чтении.
+FANOUT_LIMIT = getattr(settings, 'TIMELINE_FANOUT_LIMIT', 5000)
+
+
+def is_fanned_out(author_id) -> bool:
+    return not UserCounter.objects.filter(
+        user_id=author_id,
+        followers_count__gte=FANOUT_LIMIT
+    ).exists()
+
+
+def trim(user_ids):
+    """Оставляет в лентах пользователей не больше TIMELINE_LENGTH записей."""
+    cutoff = TimelineEntry.objects.filter(
+        user=OuterRef('user')
+    ).order_by('-pub_date').values('pub_date')[
+        TIMELINE_LENGTH - 1:TIMELINE_LENGTH
+    ]
+    TimelineEntry.objects.filter(
+        user__in=user_ids,
+        pub_date__lt=Subquery(cutoff)
+    ).delete()
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if not is_fanned_out(post.author_id):
+        return
+    followers = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+    )
+    if not followers:
+        return
+    with transaction.atomic():
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=post.pk,
+                           author_id=post.author_id, pub_date=post.pub_date)
+             for user_id in followers],
+            ignore_conflicts=True
+        )
+        trim(followers)
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту последними постами автора после подписки."""
+    if not is_fanned_out(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:TIMELINE_LENGTH]
+    with transaction.atomic():
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=post_id,
+                           author_id=author_id, pub_date=pub_date)
+             for post_id, pub_date in posts],
+            ignore_conflicts=True
+        )
+        trim([user_id])
+
+
+def remove(user_id, author_id):
+    """Убирает посты автора из ленты после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id=author_id).delete()
+
+
+def rebuild(user_id):
+    """
+    Собирает ленту пользователя заново по текущим подпискам: последние
+    посты всех раскладываемых авторов одним запросом, без trim.
+    """
+    authors = Follow.objects.filter(user_id=user_id).exclude(
+        author__counters__followers_count__gte=FANOUT_LIMIT
+    ).values('author')
+    posts = Post.objects.filter(author__in=authors).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'author_id', 'pub_date')[:TIMELINE_LENGTH]
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id=user_id).delete()
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=post_id,
+                           author_id=author_id, pub_date=pub_date)
+             for post_id, author_id, pub_date in posts]
+        )
+
+
+def feed(user):
+    """
+    Посты ленты подписок с ключом сортировки (feed_date, feed_id).
+
+    Если пользователь подписан на авторов, которые не раскладываются
+    по лентам, их посты подмешиваются к материализованной ленте.
+    """
+    merged = list(
+        UserCounter.objects.filter(
+            user__following__user=user,
+            followers_count__gte=FANOUT_LIMIT
+        ).values_list('user_id', flat=True)
+    )
+    if not merged:
+        # Оба поля ключа берутся из TimelineEntry, чтобы сортировка
+        # шла по индексу ленты без временного B-дерева.
+        return Post.objects.filter(timeline__user=user).annotate(
+            feed_date=F('timeline__pub_date'),
+            feed_id=F('timeline__post')
+        )
+    return Post.objects.filter(
+        Q(pk__in=TimelineEntry.objects.filter(user=user).values('post'))
+        | Q(author__in=merged)
+    ).annotate(feed_date=F('pub_date'), feed_id=F('id'))
@@ -0,0 +1,340 @@
+"""
+Потоковые выгрузка и загрузка постов, комментариев и подписок в NDJSON.
+
+Каждая строка - один объект {"model": ..., поля}. Связи записаны
+естественными ключами: пользователь - username, группа - slug, пост -
+id из файла. Строки идут в порядке зависимостей: группы, пользователи,
+посты, комментарии, подписки.
+
+Пост уже загружен, если у его автора есть пост с той же датой и
+текстом, комментарий - если у поста есть такой же комментарий того же
+автора с той же датой; повторная загрузка того же файла ничего не
+дублирует. Новый
+объект сохраняет id из файла, если он свободен, иначе получает новый;
+комментарии находят свой пост по таблице замен id.
+
+Загрузка идёт пачками bulk_create без сигналов моделей; то, что делают
+сигналы (счётчики, ленты, поисковый индекс, поколения кеша), делается
+пачкой в конце или вместе с каждой пачкой постов.
+"""
+import gzip
+import io
+import json
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from core import generations
+
+from . import counters, follows, search, timeline
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+CHUNK = 2000
+# Сколько id подставлять в один IN (...) при пересборке лент.
+IN_CHUNK = 500
+
+# Модель в файле, модель Django и поля: ключ в файле -> поле values().
+EXPORTS = (
+    ('group', Group, {'slug': 'slug', 'title': 'title',
+                      'description': 'description'}),
+    ('user', User, {'username': 'username', 'first_name': 'first_name',
+                    'last_name': 'last_name', 'email': 'email',
+                    'password': 'password', 'date_joined': 'date_joined',
+                    'is_active': 'is_active'}),
+    ('post', Post, {'id': 'id', 'author': 'author__username',
+                    'group': 'group__slug', 'text': 'text',
+                    'pub_date': 'pub_date', 'image': 'image',
+                    'image_placeholder': 'image_placeholder'}),
+    ('comment', Comment, {'id': 'id', 'post': 'post_id',
+                          'author': 'author__username', 'text': 'text',
+                          'created': 'created'}),
+    ('follow', Follow, {'user': 'user__username',
+                        'author': 'author__username'}),
+)
+
+
+@contextmanager
+def open_stream(path, mode):
+    """Файл, .gz или '-' для stdin/stdout, в текстовом режиме UTF-8."""
+    if path == '-':
+        std = sys.stdin if mode == 'r' else sys.stdout
+        stream = io.TextIOWrapper(std.buffer, encoding='utf-8')
+        try:
+            yield stream
+        finally:
+            # Сам stdin/stdout остаётся открытым.
+            stream.flush()
+            stream.detach()
+        return
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, f'{mode}t', encoding='utf-8') as stream:
+        yield stream
+
+
+class _Encoder(DjangoJSONEncoder):
+    def default(self, value):
+        # DjangoJSONEncoder отбрасывает микросекунды, а по ним с id
+        # листаются ленты.
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return super().default(value)
+
+
+def export(stream, chunk=CHUNK) -> Counter:
+    """Пишет все объекты в stream; в памяти не больше chunk строк."""
+    encoder = _Encoder(ensure_ascii=False)
+    totals = Counter()
+    for name, model, fields in EXPORTS:
+        rows = model.objects.order_by('pk').values_list(
+            *fields.values()
+        ).iterator(chunk_size=chunk)
+        for row in rows:
+            stream.write(encoder.encode({'model': name,
+                                         **dict(zip(fields, row))}))
+            stream.write('\n')
+            totals[name] += 1
+    return totals
+
+
+class Importer:
+    """Загрузка NDJSON пачками по chunk объектов одного типа."""
+
+    def __init__(self, chunk=CHUNK):
+        self.chunk = chunk
+        self.totals = Counter()
+        self.kind = None
+        self.pending = []
+        # Кеши естественных ключей: username -> id, slug -> id.
+        self.users = {}
+        self.groups = {}
+        # id поста в файле -> id в базе, только если они различаются.
+        self.post_ids = {}
+        # Что загрузка поменяла: для лент и поколений кеша в finish.
+        self.authors = set()
+        self.group_ids = set()
+        self.commented = set()
+        self.followers = set()
+        self.followed = set()
+        self.has_images = False
+
+    def load(self, lines) -> Counter:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                kind = record.pop('model')
+            except (ValueError, KeyError, AttributeError):
+                raise ValueError(f'Строка {number}: не объект NDJSON.')
+            if not hasattr(self, f'_save_{kind}'):
+                raise ValueError(
+                    f'Строка {number}: неизвестная модель {kind}.'
+                )
+            if kind != self.kind:
+                self.flush()
+                self.kind = kind
+            self.pending.append(record)
+            if len(self.pending) >= self.chunk:
+                self.flush()
+        self.flush()
+        self.finish()
+        return self.totals
+
+    def flush(self):
+        if not self.pending:
+            return
+        records, self.pending = self.pending, []
+        with transaction.atomic():
+            created = getattr(self, f'_save_{self.kind}')(records)
+        self.totals[self.kind] += created
+
+    def _resolve(self, cache, model, field, keys):
+        missing = {key for key in keys if key not in cache}
+        if missing:
+            cache.update(model.objects.filter(
+                **{f'{field}__in': missing}
+            ).values_list(field, 'pk'))
+        unknown = missing - cache.keys()
+        if unknown:
+            raise ValueError(f'Нет объектов {model._meta.verbose_name}: '
+                             f'{", ".join(sorted(unknown)[:10])}')
+
+    def _existing(self, queryset, records, keys) -> dict:
+        """
+        Значения keys -> id для записей, которые уже есть в базе; по
+        тексту не фильтруем, он только сравнивается.
+        """
+        if not records:
+            return {}
+        rows = queryset.filter(**{
+            f'{key}__in': {record[key] for record in records}
+            for key in keys if key != 'text'
+        }).values_list(*keys, 'pk')
+        return {row[:-1]: row[-1] for row in rows}
+
+    def _ids(self, model, records) -> list:
+        """id из файла, а занятые в базе - новые после всех занятых."""
+        ids = [record['id'] for record in records]
+        taken = set(model.objects.filter(pk__in=ids).values_list(
+            'pk', flat=True
+        ))
+        if not taken:
+            return ids
+        next_id = max(
+            model.objects.aggregate(last=Max('pk'))['last'], max(ids)
+        ) + 1
+        free = []
+        for pk in ids:
+            if pk in taken:
+                pk, next_id = next_id, next_id + 1
+            free.append(pk)
+        return free
+
+    def _save_group(self, records):
+        Group.objects.bulk_create(
+            [Group(slug=record['slug'], title=record['title'],
+                   description=record['description'])
+             for record in records],
+            ignore_conflicts=True
+        )
+        self._resolve(self.groups, Group, 'slug',
+                      [record['slug'] for record in records])
+        return len(records)
+
+    def _save_user(self, records):
+        User.objects.bulk_create(
+            [User(username=record['username'],
+                  first_name=record['first_name'],
+                  last_name=record['last_name'],
+                  email=record['email'],
+                  password=record['password'],
+                  date_joined=parse_datetime(record['date_joined']),
+                  is_active=record['is_active'])
+             for record in records],
+            ignore_conflicts=True
+        )
+        self._resolve(self.users, User, 'username',
+                      [record['username'] for record in records])
+        return len(records)
+
+    def _save_post(self, records):
+        self._resolve(self.users, User, 'username',
+                      [record['author'] for record in records])
+        self._resolve(self.groups, Group, 'slug',
+                      [record['group'] for record in records
+                       if record['group']])
+        for record in records:
+            record['author_id'] = self.users[record['author']]
+            record['pub_date'] = parse_datetime(record['pub_date'])
+        keys = ('author_id', 'pub_date', 'text')
+        existing = self._existing(Post.objects, records, keys)
+        new = []
+        for record in records:
+            pk = existing.get(tuple(record[key] for key in keys))
+            if pk is None:
+                new.append(record)
+            elif pk != record['id']:
+                self.post_ids[record['id']] = pk
+        posts = []
+        for record, pk in zip(new, self._ids(Post, new)):
+            if pk != record['id']:
+                self.post_ids[record['id']] = pk
+            posts.append(Post(id=pk,
+                              author_id=record['author_id'],
+                              group_id=self.groups.get(record['group']),
+                              text=record['text'],
+                              pub_date=record['pub_date'],
+                              image=record['image'],
+                              image_placeholder=record['image_placeholder']))
+        Post.objects.bulk_create(posts)
+        search.index_many((post.pk, post.text) for post in posts)
+        for post in posts:
+            self.authors.add(post.author_id)
+            self.group_ids.add(post.group_id)
+            self.has_images = self.has_images or bool(post.image)
+        return len(posts)
+
+    def _save_comment(self, records):
+        self._resolve(self.users, User, 'username',
+                      [record['author'] for record in records])
+        for record in records:
+            record['author_id'] = self.users[record['author']]
+            record['post_id'] = self.post_ids.get(record['post'],
+                                                  record['post'])
+            record['created'] = parse_datetime(record['created'])
+        keys = ('post_id', 'author_id', 'created', 'text')
+        existing = self._existing(Comment.objects, records, keys)
+        new = [record for record in records
+               if tuple(record[key] for key in keys) not in existing]
+        Comment.objects.bulk_create([
+            Comment(id=pk, post_id=record['post_id'],
+                    author_id=record['author_id'],
+                    text=record['text'],
+                    created=record['created'])
+            for record, pk in zip(new, self._ids(Comment, new))
+        ])
+        self.commented.update(record['post_id'] for record in new)
+        return len(new)
+
+    def _save_follow(self, records):
+        self._resolve(self.users, User, 'username',
+                      [record[key] for record in records
+                       for key in ('user', 'author')])
+        pairs = {(self.users[record['user']], self.users[record['author']])
+                 for record in records}
+        pairs -= set(Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs}
+        ).values_list('user_id', 'author_id'))
+        Follow.objects.bulk_create(
+            [Follow(user_id=user_id, author_id=author_id)
+             for user_id, author_id in pairs],
+            ignore_conflicts=True
+        )
+        self.followers.update(user_id for user_id, _ in pairs)
+        self.followed.update(author_id for _, author_id in pairs)
+        return len(pairs)
+
+    def finish(self):
+        """Счётчики, ленты и кеш - то, что при save делают сигналы."""
+        self._reset_sequences()
+        counters.recount()
+        users = set(self.followers)
+        authors = sorted(self.authors)
+        for start in range(0, len(authors), IN_CHUNK):
+            users.update(Follow.objects.filter(
+                author_id__in=authors[start:start + IN_CHUNK]
+            ).values_list('user_id', flat=True))
+        for user_id in users:
+            timeline.rebuild(user_id)
+        follows.forget(self.followers)
+        # Поколения только того, что загрузка поменяла.
+        if self.authors or self.commented or self.followers:
+            generations.bump('pages')
+        if self.authors:
+            generations.bump('feed')
+        for author_id in self.authors | self.followers | self.followed:
+            generations.bump('author', author_id)
+        for group_id in self.group_ids - {None}:
+            generations.bump('group', group_id)
+        for post_id in self.commented:
+            generations.bump('post', post_id)
+
+    def _reset_sequences(self):
+        # Посты и комментарии пишутся с явными id; в PostgreSQL
+        # последовательность id без этого выдала бы уже занятые.
+        statements = connection.ops.sequence_reset_sql(no_style(),
+                                                       [Post, Comment])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -1,8 +1,304 @@
-from django.core.paginator import Paginator
+import base64
+import datetime
+import json
+from collections.abc import Sequence
 
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 
-def page_func(request, objects, pages: int):
-    paginator = Paginator(objects, pages)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+# Сколько соседних страниц показывать в навигации с каждой стороны.
+PAGE_WINDOW = 2
+
+
+def _query(request, **params) -> str:
+    """Строка запроса текущей страницы с заменёнными параметрами."""
+    query = request.GET.copy()
+    for key in ('page', 'cursor'):
+        query.pop(key, None)
+    for key, value in params.items():
+        if value is not None:
+            query[key] = value
+    return query.urlencode()
+
+
+def encode_cursor(values, number: int) -> str:
+    values = [value.isoformat() if hasattr(value, 'isoformat') else value
+              for value in values]
+    raw = json.dumps([*values, number]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int = 2):
+    """
+    Возвращает ((значения ключа), номер страницы) или бросает
+    ValueError. Ключ - даты или числа (например, релевантность
+    в поиске), последним всегда идёт id; size - длина ключа.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        *values, number = json.loads(base64.urlsafe_b64decode(padded))
+        values = [parse_datetime(value) if isinstance(value, str) else value
+                  for value in values]
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Некорректный курсор')
+    if (len(values) != size
+            or not all(isinstance(value, (datetime.datetime, int, float))
+                       and not isinstance(value, bool) for value in values)
+            or not isinstance(values[-1], int)
+            or not isinstance(number, int)):
+        raise ValueError('Некорректный курсор')
+    return tuple(values), max(number, 1)
+
+
+def keyset_after(queryset, fields, key):
+    """Объекты строго после key при сортировке по убыванию fields."""
+    condition = Q()
+    for index, field in enumerate(fields):
+        equal = dict(zip(fields[:index], key[:index]))
+        condition |= Q(**equal, **{f'{field}__lt': key[index]})
+    return queryset.filter(condition)
+
+
+def keyset_slice(queryset, per_page: int, fields=('pub_date', 'id'),
+                 cursor=None):
+    """
+    Порция объектов после курсора и курсор следующей (или None) одним
+    запросом; для подгрузки «ещё», где номера страниц не нужны.
+    Некорректный курсор - ValueError.
+    """
+    queryset = queryset.order_by(*(f'-{field}' for field in fields))
+    number = 1
+    if cursor:
+        key, number = decode_cursor(cursor, size=len(fields))
+        queryset = keyset_after(queryset, fields, key)
+    objects = list(queryset[:per_page + 1])
+    if len(objects) <= per_page:
+        return objects, None
+    objects = objects[:per_page]
+    last = [getattr(objects[-1], field) for field in fields]
+    return objects, encode_cursor(last, number + 1)
+
+
+class CursorPage(Sequence):
+    """Страница ленты, совместимая по интерфейсу с django Page."""
+
+    def __init__(self, object_list, number, paginator, cursor,
+                 previous, following, request=None):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self.cursor = cursor
+        # Списки (номер, курсор) соседних страниц, ближайшая первой.
+        self._previous = previous
+        self._following = following
+        self._request = request
+
+    def __repr__(self) -> str:
+        return f'<Page {self.number} cursor={self.cursor or "-"}>'
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return bool(self._following)
+
+    def has_previous(self) -> bool:
+        return bool(self._previous)
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self) -> int:
+        return self._following[0][0]
+
+    def previous_page_number(self) -> int:
+        return self._previous[0][0]
+
+    def _link(self, cursor) -> str:
+        if self._request is None:
+            return f'cursor={cursor}' if cursor else ''
+        return _query(self._request, cursor=cursor)
+
+    @property
+    def first_query(self) -> str:
+        return self._link(None)
+
+    @property
+    def previous_query(self) -> str:
+        return self._link(self._previous[0][1]) if self._previous else None
+
+    @property
+    def next_query(self) -> str:
+        return self._link(self._following[0][1]) if self._following else None
+
+    @property
+    def last_query(self):
+        # Номер последней страницы неизвестен без COUNT(*).
+        return None
+
+    @property
+    def window(self):
+        pages = list(reversed(self._previous))
+        pages.append((self.number, self.cursor))
+        pages.extend(self._following)
+        return [(number, self._link(cursor)) for number, cursor in pages]
+
+
+class CursorPaginator:
+    """
+    Пагинация по ключу (дата, id) вместо OFFSET и COUNT(*).
+
+    Каждая страница начинается строго после ключа из курсора, поэтому
+    стоимость запроса не зависит от глубины листания.
+    """
+
+    def __init__(self, object_list, per_page: int,
+                 fields=('pub_date', 'id'), window: int = PAGE_WINDOW,
+                 request=None):
+        self.fields = fields
+        self.object_list = object_list.order_by(
+            *(f'-{field}' for field in fields)
+        )
+        self.per_page = int(per_page)
+        self.window = window
+        self.request = request
+
+    def _key(self, obj):
+        return tuple(getattr(obj, field) for field in self.fields)
+
+    def _after(self, queryset, key):
+        return keyset_after(queryset, self.fields, key)
+
+    def _before(self, queryset, key):
+        (date_field, pk_field), (date, pk) = self.fields, key
+        return queryset.filter(
+            Q(**{f'{date_field}__gt': date})
+            | Q(**{date_field: date, f'{pk_field}__gt': pk})
+        ).order_by(*self.fields)
+
+    def _following(self, last_key, number):
+        ahead = list(
+            self._after(self.object_list, last_key)
+            .values_list(*self.fields)[:self.per_page * self.window]
+        )
+        pages = []
+        for step, offset in enumerate(range(0, len(ahead), self.per_page), 1):
+            key = last_key if offset == 0 else ahead[offset - 1]
+            pages.append((number + step, encode_cursor(key, number + step)))
+        return pages
+
+    def _previous(self, first_key, number):
+        behind = list(
+            self._before(self.object_list, first_key)
+            .values_list(*self.fields)[:self.per_page * self.window + 1]
+        )
+        pages = []
+        for step in range(1, self.window + 1):
+            if len(behind) < (step - 1) * self.per_page + 1:
+                break
+            if len(behind) > step * self.per_page and number - step > 1:
+                key = behind[step * self.per_page]
+                pages.append((number - step,
+                              encode_cursor(key, number - step)))
+            else:
+                pages.append((1, None))
+                break
+        return pages
+
+    def _build(self, object_list, number, cursor, after_key=None):
+        object_list = list(object_list)
+        if not object_list:
+            following = []
+        else:
+            following = self._following(self._key(object_list[-1]), number)
+        if number <= 1 and after_key is None:
+            previous = []
+        elif object_list:
+            previous = self._previous(self._key(object_list[0]), number)
+        else:
+            previous = [(1, None)]
+        return CursorPage(object_list, number, self, cursor,
+                          previous, following, self.request)
+
+    def page(self, number=1) -> CursorPage:
+        """Страница по номеру; OFFSET остаётся только для старых ссылок."""
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        bottom = (number - 1) * self.per_page
+        object_list = self.object_list[bottom:bottom + self.per_page]
+        return self._build(object_list, number, None)
+
+    def get_page(self, cursor) -> CursorPage:
+        try:
+            key, number = decode_cursor(cursor)
+        except ValueError:
+            return self.page(1)
+        object_list = self._after(self.object_list, key)[:self.per_page]
+        return self._build(object_list, number, cursor, after_key=key)
+
+
+class WindowPage(Page):
+    """Страница Paginator со ссылками только на соседние страницы."""
+
+    request = None
+
+    def _link(self, number) -> str:
+        if self.request is None:
+            return f'page={number}'
+        return _query(self.request, page=number)
+
+    @property
+    def first_query(self) -> str:
+        return self._link(1)
+
+    @property
+    def previous_query(self):
+        return self._link(self.number - 1) if self.has_previous() else None
+
+    @property
+    def next_query(self):
+        return self._link(self.number + 1) if self.has_next() else None
+
+    @property
+    def last_query(self):
+        return self._link(self.paginator.num_pages)
+
+    @property
+    def window(self):
+        low = max(self.number - PAGE_WINDOW, 1)
+        high = min(self.number + PAGE_WINDOW, self.paginator.num_pages)
+        return [(number, self._link(number))
+                for number in range(low, high + 1)]
+
+
+class WindowPaginator(Paginator):
+    def _get_page(self, *args, **kwargs):
+        return WindowPage(*args, **kwargs)
+
+
+def page_func(request, objects, pages: int, fields=('pub_date', 'id'),
+              count=None):
+    """
+    Страница ленты. count - хранимое число объектов, которым Paginator
+    заменяет COUNT(*) в режиме 'offset'.
+    """
+    if getattr(settings, 'POSTS_PAGINATION', 'cursor') == 'offset':
+        paginator = WindowPaginator(objects, pages)
+        if count is not None:
+            paginator.count = count
+        page_obj = paginator.get_page(request.GET.get('page'))
+        page_obj.request = request
+        return page_obj
+    paginator = CursorPaginator(objects, pages, fields=fields,
+                                request=request)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        return paginator.get_page(cursor)
+    return paginator.page(request.GET.get('page') or 1)
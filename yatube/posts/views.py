@@ -1,19 +1,42 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
-from .models import Post, Group, User, Follow
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+
+from core.asgi import (LOOP_KEY, AsyncStreamingHttpResponse, async_view,
+                       gather, sync_to_pool)
+from .models import Comment, Post, Group, User, Follow, UserCounter
 from .forms import PostForm, CommentForm
-from .utils import page_func
+from .utils import keyset_slice, page_func
+from . import search as post_search
+from . import follows, live, thumbnails, timeline
 
 
 POST_ON_PAGE = 10
 SMALL_POST_TEXT = 30
+# Сколько комментариев отдаётся за раз, в том числе на странице поста.
+COMMENTS_ON_PAGE = 20
+
+
+def _feed_page(request, posts, **kwargs):
+    """Страница ленты с прочитанными постами и ленивыми картинками."""
+    page_obj = page_func(request, posts, POST_ON_PAGE, **kwargs)
+    thumbnails.attach(page_obj)
+    return page_obj
 
 
-def index(request) -> HttpResponse:
-    posts = Post.objects.all()
+def _following(request, author):
+    follow_set = follows.for_user(request.user)
+    if follow_set is None:
+        return None
+    return author.pk in follow_set
 
-    page_obj = page_func(request, posts, POST_ON_PAGE)
+
+@async_view
+async def index(request) -> HttpResponse:
+    page_obj = await sync_to_pool(_feed_page, request,
+                                  Post.objects.for_feed())
     template = 'posts/index.html'
     title = 'Последние обновления на сайте'
     context = {
@@ -21,13 +44,15 @@ def index(request) -> HttpResponse:
         'page_obj': page_obj,
         'index': True
     }
-    return render(request, template, context)
+    return await sync_to_pool(render, request, template, context)
 
 
-def group_posts(request, slug) -> HttpResponse:
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = page_func(request, posts, POST_ON_PAGE)
+@async_view
+async def group_posts(request, slug) -> HttpResponse:
+    group = await sync_to_pool(get_object_or_404, Group, slug=slug)
+    page_obj = await sync_to_pool(_feed_page, request,
+                                  group.posts.for_feed(),
+                                  count=group.posts_count)
     template = 'posts/group_list.html'
     title = f'Записи сообщества {group.title}'
     context = {
@@ -35,43 +60,89 @@ def group_posts(request, slug) -> HttpResponse:
         'group_info': group,
         'page_obj': page_obj,
     }
-    return render(request, template, context)
+    return await sync_to_pool(render, request, template, context)
 
 
-def profile(request, username) -> HttpResponse:
-    author = get_object_or_404(User, username=username)
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user,
-            author=author.id
-        ).exists()
-    else:
-        following = None
-    posts = Post.objects.filter(author=author)
-    page_obj = page_func(request, posts, POST_ON_PAGE)
+@async_view
+async def profile(request, username) -> HttpResponse:
+    author = await sync_to_pool(get_object_or_404,
+                                User.objects.select_related('counters'),
+                                username=username)
+    counters = UserCounter.for_user(author)
+    posts = Post.objects.filter(author=author).for_feed()
+    # Подписка и страница постов читаются параллельно.
+    following, page_obj = await gather(
+        sync_to_pool(_following, request, author),
+        sync_to_pool(_feed_page, request, posts,
+                     count=counters.posts_count),
+    )
     title = 'Все посты пользователя ' + author.get_full_name()
     context = {
-        'posts_count': posts.count(),
+        'posts_count': counters.posts_count,
+        'counters': counters,
         'author': author,
         'title': title,
         'page_obj': page_obj,
         'following': following
     }
-    return render(request, 'posts/profile.html', context)
+    return await sync_to_pool(render, request, 'posts/profile.html',
+                              context)
 
 
-def post_detail(request, post_id) -> HttpResponse:
-    post = get_object_or_404(Post, id=post_id)
+def comments_page(post_id, cursor=None) -> dict:
+    """Порция комментариев поста по курсору (created, id)."""
+    comments, next_cursor = keyset_slice(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        COMMENTS_ON_PAGE,
+        fields=('created', 'id'),
+        cursor=cursor
+    )
+    next_url = None
+    if next_cursor:
+        next_url = (reverse('posts:post_comments', args=[post_id])
+                    + f'?cursor={next_cursor}')
+    return {'comments': comments, 'next_url': next_url}
+
+
+@async_view
+async def post_detail(request, post_id) -> HttpResponse:
+    post = await sync_to_pool(get_object_or_404, Post.objects.for_detail(),
+                              id=post_id)
+    thumbnails.attach([post])
     form = CommentForm()
-    posts_count = Post.objects.filter(author=post.author).only('id').count()
+    posts_count = UserCounter.for_user(post.author).posts_count
     title = 'Пост ' + post.text[:SMALL_POST_TEXT]
     context = {
         'title': title,
         'post': post,
         'posts_count': posts_count,
         'form': form,
+        # Не читается из базы, если фрагмент комментариев в кеше.
+        'comments_page': SimpleLazyObject(lambda: comments_page(post.pk)),
     }
-    return render(request, 'posts/post_detail.html', context)
+    return await sync_to_pool(render, request, 'posts/post_detail.html',
+                              context)
+
+
+def post_comments(request, post_id) -> HttpResponse:
+    """Следующая порция комментариев: HTML-фрагмент или JSON."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    try:
+        page = comments_page(post.pk, request.GET.get('cursor'))
+    except ValueError:
+        return HttpResponseBadRequest('Некорректный курсор')
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {'id': comment.pk,
+                 'author': comment.author.username,
+                 'text': comment.text,
+                 'created': comment.created.isoformat()}
+                for comment in page['comments']
+            ],
+            'next': page['next_url'],
+        })
+    return render(request, 'includes/comment_list.html', page)
 
 
 @login_required
@@ -131,31 +202,83 @@ def add_comment(request, post_id) -> HttpResponse:
 @login_required
 def follow_index(request):
     title = 'Лента'
-    posts = Post.objects.filter(
-        author__in=request.user.follower.values_list('author')
-    )
-    page_obj = page_func(request, posts, POST_ON_PAGE)
+    posts = timeline.feed(request.user).for_feed()
+    page_obj = page_func(request, posts, POST_ON_PAGE,
+                         fields=('feed_date', 'feed_id'))
+    thumbnails.attach(page_obj)
     context = {
         'title': title,
         'page_obj': page_obj,
-        'follow': True
+        'follow': True,
+        'follow_set': follows.for_user(request.user),
+        # С какого поста ждать уведомления о новых; ждать без потока
+        # можно только под ASGI.
+        'live_events': LOOP_KEY in request.META,
+        'latest_id': max((post.pk for post in page_obj), default=0),
     }
     return render(request, 'posts/follow.html', context)
 
 
+@login_required
+def follow_events(request):
+    """Server-sent events о новых постах авторов из подписок."""
+    authors = list(follows.for_user(request.user))
+    last_id = (request.META.get('HTTP_LAST_EVENT_ID')
+               or request.GET.get('after'))
+    loop = request.META.get(LOOP_KEY)
+    if loop is None:
+        # Под WSGI воркер не держим: только то, что уже вышло.
+        events = live.EventStream(None, live.missed(authors, last_id),
+                                  last_id)
+        response = HttpResponse(events.once(),
+                                content_type=live.CONTENT_TYPE)
+        response['Cache-Control'] = 'no-cache'
+        return response
+    # Подписка раньше чтения пропущенного: пост между ними не потеряется.
+    subscription = live.subscribe(authors, loop=loop)
+    try:
+        events = live.EventStream(subscription, live.missed(authors, last_id),
+                                  last_id)
+    except Exception:
+        subscription.close()
+        raise
+    response = AsyncStreamingHttpResponse(events.stream(),
+                                          content_type=live.CONTENT_TYPE)
+    # Подписка снимается, когда сервер закрывает ответ.
+    response._closable_objects.append(subscription)
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def search(request) -> HttpResponse:
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        posts = post_search.search(query).for_feed()
+        page_obj = page_func(request, posts, POST_ON_PAGE,
+                             fields=('score', 'id'))
+        thumbnails.attach(page_obj)
+    context = {
+        'title': f'Поиск: {query}' if query else 'Поиск',
+        'query': query,
+        'page_obj': page_obj,
+        'follow_set': follows.for_user(request.user),
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).exists():
-        return redirect('posts:profile', username=username)
     if author != request.user:
-        Follow.objects.create(
+        # Кешу подписок уникальность не доверяем: он мог отстать от базы.
+        _, created = Follow.objects.get_or_create(
             user=request.user,
             author=author
         )
+        if not created:
+            follows.forget([request.user.pk])
     return redirect('posts:profile', username=username)
 
 
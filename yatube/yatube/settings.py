@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
     'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -50,7 +51,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -64,18 +68,27 @@ ROOT_URLCONF = 'yatube.urls'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static'), os.path.join(BASE_DIR, 'media')]
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    # Шаблоны компилируются один раз на процесс.
+    TEMPLATE_LOADERS = [('django.template.loaders.cached.Loader',
+                         TEMPLATE_LOADERS)]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.profiling.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.cache.fragment_cache',
             ],
         },
     },
@@ -88,11 +101,32 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # WAL, PRAGMA и очередь записи (core.sqlite_backend); соединение
+        # живёт в потоке до CONN_MAX_AGE секунд.
+        'ENGINE': 'core.sqlite_backend',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 600,
     }
 }
 
+# Реплики только для чтения (core.replicas): GET-запросы читают с них,
+# запись и чтение сразу после записи идут в 'default'. Локально реплику
+# заменяет второй файл SQLite, его обновляет manage.py sync_replica:
+#
+# DATABASES['replica'] = {
+#     'ENGINE': 'django.db.backends.sqlite3',
+#     'NAME': os.path.join(BASE_DIR, 'db-replica.sqlite3'),
+#     'TEST': {'MIRROR': 'default'},
+# }
+# DATABASE_REPLICAS = ['replica']
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# Сколько секунд после записи пользователь читает основную базу.
+REPLICA_STICKY_SECONDS = 15
+# Реплика, отставшая больше стольких секунд, не используется.
+REPLICA_MAX_LAG = 5
+REPLICA_LAG_CHECK_INTERVAL = 2
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -142,8 +176,104 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки крупнее этого размера пишутся во временный файл, а не в память.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+# Ограничения картинок постов (posts.images).
+POST_IMAGE_MAX_BYTES = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+POST_IMAGE_MAX_SIDE = 2560
+
+# Общий для всех воркеров на сервере кеш в файле SQLite.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backend.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_SIZE': 64 * 1024 * 1024,
+        },
     }
 }
+# Тесты работают с кешем в памяти процесса (core.test_runner).
+TEST_RUNNER = 'core.test_runner.LocMemCacheRunner'
+
+# Фрагменты сбрасываются поколениями (core.generations) сразу после
+# записи, поэтому могут жить часами.
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Кеш целых страниц для анонимных читателей (core.middleware).
+# При разработке выключен, чтобы сразу видеть изменения шаблонов.
+PAGE_CACHE_ENABLED = not DEBUG
+PAGE_CACHE_VIEWS = [
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'api:posts',
+    'api:post_detail',
+    'api:post_comments',
+    'api:groups',
+    'api:group_posts',
+    'api:profile_posts',
+]
+PAGE_CACHE_TIMEOUT = 60 * 10
+# Сколько ещё отдавать устаревшую страницу, пока её пересобирают.
+PAGE_CACHE_STALE_TIMEOUT = 60
+PAGE_CACHE_LOCK_TIMEOUT = 30
+
+# 'cursor' - пагинация лент по ключу (pub_date, id), 'offset' - Paginator
+POSTS_PAGINATION = 'cursor'
+
+# Материализованная лента подписок: длина ленты и порог подписчиков,
+# после которого посты автора подмешиваются при чтении.
+TIMELINE_LENGTH = 800
+TIMELINE_FANOUT_LIMIT = 5000
+
+# Сколько живёт в кеше множество подписок пользователя (posts.follows);
+# подписка и отписка сбрасывают его после коммита.
+FOLLOWS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Фоновое создание миниатюр после загрузки картинки (posts.thumbnails).
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_QUEUE = 32
+
+# Пулы потоков ASGI-приложения (core.asgi): middleware и обычные view,
+# и блокирующая работа асинхронных view - база, миниатюры, шаблоны.
+ASGI_REQUEST_THREADS = 32
+ASGI_SYNC_THREADS = 4
+
+# Профилирование доли запросов (core.profiling): заголовок Server-Timing
+# и строка в PROFILING_LOG. 0 - выключено, 1 - каждый запрос. Порог в мс,
+# после которого сохраняется профиль cProfile; None - cProfile выключен,
+# он замедляет выбранные запросы в разы.
+PROFILING_SAMPLE_RATE = 0.0
+PROFILING_LOG = os.path.join(BASE_DIR, 'profiling.log')
+PROFILING_CPROFILE_THRESHOLD = None
+PROFILING_CPROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'profiling': {'format': '%(asctime)s %(message)s'},
+    },
+    'handlers': {
+        'profiling': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': PROFILING_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+            'formatter': 'profiling',
+        },
+    },
+    'loggers': {
+        'yatube.profiling': {
+            'handlers': ['profiling'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}